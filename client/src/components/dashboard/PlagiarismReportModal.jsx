@@ -1,9 +1,34 @@
-import React from 'react';
+import React, { useState } from 'react';
 import './Dashboard.css';
 
 const PlagiarismReportModal = ({ isOpen, onClose, submission }) => {
+  const [openComparison, setOpenComparison] = useState(null);
+  const [passages, setPassages] = useState({});
+  const [passagesError, setPassagesError] = useState(null);
+
   if (!isOpen || !submission) return null;
 
+  // Per-upload TF-IDF comparisons (older results stored them at the top level)
+  const comparisons = submission.plagiarism_details?.tfidf?.comparisons
+    || submission.plagiarism_details?.comparisons;
+
+  // Scores are stored as 0-1 similarities
+  const toPercent = (score) => (score <= 1 ? score * 100 : score);
+
+  const togglePassages = (otherId) => {
+    if (openComparison === otherId) {
+      setOpenComparison(null);
+      return;
+    }
+    setOpenComparison(otherId);
+    setPassagesError(null);
+    if (passages[otherId]) return;
+    fetch(`/api/submissions/${submission.id}/matches/${otherId}`, { credentials: 'include' })
+      .then(res => res.json().then(data => (res.ok ? data : Promise.reject(data.error))))
+      .then(data => setPassages(prev => ({ ...prev, [otherId]: data })))
+      .catch(error => setPassagesError(error || 'Failed to load matched passages'));
+  };
+
   const getSeverityColor = (score) => {
     if (score >= 70) return '#dc3545'; // Red for high similarity
     if (score >= 40) return '#ffc107'; // Yellow for medium similarity
@@ -56,11 +81,11 @@ const PlagiarismReportModal = ({ isOpen, onClose, submission }) => {
             )}
           </div>
 
-          {submission.plagiarism_details?.comparisons && (
+          {comparisons && (
             <div className="similarity-details">
               <h3>Detailed Comparison Results</h3>
               <div className="comparison-list">
-                {submission.plagiarism_details.comparisons.map((comparison, index) => (
+                {comparisons.map((comparison, index) => (
                   <div 
                     key={comparison.submission_id} 
                     className="comparison-item"
@@ -69,18 +94,62 @@ const PlagiarismReportModal = ({ isOpen, onClose, submission }) => {
                       margin: '5px 0',
                       backgroundColor: '#f8f9fa',
                       borderRadius: '4px',
-                      borderLeft: `4px solid ${getSeverityColor(comparison.similarity_score)}`
+                      borderLeft: `4px solid ${getSeverityColor(toPercent(comparison.similarity_score))}`
                     }}
                   >
                     <div className="comparison-header">
                       <span>Submission #{index + 1}</span>
                       <span 
                         className="similarity-score"
-                        style={{ color: getSeverityColor(comparison.similarity_score) }}
+                        style={{ color: getSeverityColor(toPercent(comparison.similarity_score)) }}
                       >
-                        {comparison.similarity_score.toFixed(1)}% Similar
+                        {toPercent(comparison.similarity_score).toFixed(1)}% Similar
                       </span>
+                      <button
+                        className="passages-button"
+                        onClick={() => togglePassages(comparison.submission_id)}
+                        style={{
+                          marginLeft: '10px',
+                          padding: '2px 8px',
+                          border: '1px solid #6c757d',
+                          borderRadius: '4px',
+                          background: 'white',
+                          cursor: 'pointer'
+                        }}
+                      >
+                        {openComparison === comparison.submission_id ? 'Hide passages' : 'Matched passages'}
+                      </button>
                     </div>
+                    {openComparison === comparison.submission_id && (
+                      <div className="matched-passages" style={{ marginTop: '10px' }}>
+                        {passagesError && (
+                          <div className="error-message" style={{ color: '#dc3545' }}>{passagesError}</div>
+                        )}
+                        {!passagesError && !passages[comparison.submission_id] && <p>Loading...</p>}
+                        {passages[comparison.submission_id] && (
+                          passages[comparison.submission_id].spans.length === 0 ? (
+                            <p>No matching passages found.</p>
+                          ) : (
+                            <>
+                              <p>{passages[comparison.submission_id].coverage}% of this submission matches.</p>
+                              {passages[comparison.submission_id].spans.map(span => (
+                                <div
+                                  key={`${span.start}-${span.other_start}`}
+                                  style={{ display: 'flex', gap: '10px', margin: '8px 0' }}
+                                >
+                                  <blockquote style={{ flex: 1, margin: 0, padding: '6px', background: '#fff3cd' }}>
+                                    {span.text}
+                                  </blockquote>
+                                  <blockquote style={{ flex: 1, margin: 0, padding: '6px', background: '#fff3cd' }}>
+                                    {span.other_text}
+                                  </blockquote>
+                                </div>
+                              ))}
+                            </>
+                          )
+                        )}
+                      </div>
+                    )}
                   </div>
                 ))}
               </div>
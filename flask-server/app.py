@@ -1,7 +1,6 @@
 from flask import Flask, request, jsonify, session, redirect
 from flask_cors import CORS
-from mongoengine import connect
-from mongoengine.connection import ConnectionFailure
+from utils.mongo import connect_mongo
 from models.user import User
 from models.assignment import Assignment
 from models.submission import Submission
@@ -12,6 +11,7 @@ from routes.library import library_bp
 from routes.timetable import timetable_bp
 from routes.notifications import notifications_bp
 from config import Config
+from ml_models.model_registry import model_registry
 import os
 import logging
 from datetime import timedelta
@@ -113,29 +113,17 @@ def options_handler(path):
     return response
 
 # MongoDB connection with error handling
-try:
-    mongodb_uri = os.getenv('MONGODB_URI')
-    if not mongodb_uri:
-        # Fallback to localhost MongoDB in development
-        if not IS_PRODUCTION:
-            mongodb_uri = 'mongodb://localhost:27017/assignment_checker'
-            logger.warning(f"MONGODB_URI not set, using default: {mongodb_uri}")
-        else:
-            raise ValueError("MONGODB_URI environment variable is not set")
-
-    connect(host=mongodb_uri)
-    logger.info(f"Successfully connected to MongoDB at: {mongodb_uri.split('@')[-1] if '@' in mongodb_uri else mongodb_uri}")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    raise
-
-# Register blueprints
-app.register_blueprint(assignments_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(library_bp)
-app.register_blueprint(timetable_bp)
-app.register_blueprint(notifications_bp)
+connect_mongo(IS_PRODUCTION)
+
+# Register blueprints; a 'worker' role process only serves the health check
+logger.info(f"Process role: {Config.ROLE}")
+if Config.SERVES_API:
+    app.register_blueprint(assignments_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(library_bp)
+    app.register_blueprint(timetable_bp)
+    app.register_blueprint(notifications_bp)
 
 # Non-prefixed route handlers (to support both /api and non-/api routes)
 # Auth routes
@@ -213,9 +201,15 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'message': 'Server is running',
-        'environment': 'production' if IS_PRODUCTION else 'development'
+        'environment': 'production' if IS_PRODUCTION else 'development',
+        'role': Config.ROLE,
+        'models': model_registry.stats()
     })
 
 if __name__ == '__main__':
     logger.info("Starting Flask server...")
+    # With the reloader only the child process (WERKZEUG_RUN_MAIN) runs jobs
+    if Config.RUNS_JOBS and (IS_PRODUCTION or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        from worker import start_embedded
+        start_embedded()
     app.run(debug=not IS_PRODUCTION, port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Measure how long importing the web app takes and check that neither importing
+it nor serving uploads and deletes pulls in the ML stack, which should only
+load in the worker:
+
+    python -m benchmarks.import_time [--module app] [--top 15]
+        [--mongodb-uri mongodb://localhost:27017/autoassign_import_check] [--skip-requests]
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter,
+prints the slowest imports and exits with status 1 if any of ``ML_PACKAGES``
+was imported. Then, in another fresh interpreter with ``AUTOASSIGN_ROLE=web``,
+it submits, resubmits and deletes a submission through the Flask test client
+against a scratch database (which must be empty, and is dropped afterwards)
+and fails the same way if any request imported one of them. Run it in CI so a
+new top-level import of e.g. sklearn in a route module, or a route calling
+into the processing pipeline, is caught.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# Packages the web tier must not import at startup
+ML_PACKAGES = {
+    'torch', 'sentence_transformers', 'transformers', 'onnxruntime',
+    'sklearn', 'datasketch', 'scipy', 'nltk'
+}
+
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)')
+
+DEFAULT_MONGODB_URI = os.environ.get('IMPORT_CHECK_MONGODB_URI', 'mongodb://localhost:27017/autoassign_import_check')
+
+# Run in a fresh interpreter: seed a professor, a student and an assignment,
+# submit, resubmit and delete through the routes, print the loaded modules
+REQUEST_SCRIPT = """
+import io, sys, json, datetime
+from mongoengine.connection import get_db
+db = None
+try:
+    import app as application
+    from models.user import User
+    from models.assignment import Assignment
+    from models.submission import Submission
+
+    db = get_db()
+    if db.list_collection_names():
+        db = None
+        raise SystemExit('Scratch database is not empty, refusing to use it')
+
+    pdf = b'%PDF-1.4\\n%%EOF\\n'
+    professor = User(email='import-check-professor@example.com', first_name='Import', last_name='Check',
+                     user_type='professor', is_professor=True)
+    professor.set_password('import-check')
+    professor.save()
+    student = User(email='import-check-student@example.com', first_name='Import', last_name='Check',
+                   user_type='student', section='A')
+    student.set_password('import-check')
+    student.save()
+    assignment = Assignment(name='Import check', course='CHECK', description='Import time check assignment',
+                            due_date=datetime.datetime.utcnow() + datetime.timedelta(days=1),
+                            sections=['A'], professor=professor)
+    assignment.question_file.put(pdf, filename='question.pdf', content_type='application/pdf')
+    assignment.save()
+
+    client = application.app.test_client()
+    statuses = {}
+    with client.session_transaction() as session:
+        session['user_id'], session['user_type'] = str(student.id), 'student'
+    for name in ('submit', 'resubmit'):
+        response = client.post(f'/api/assignments/submit/{assignment.id}', content_type='multipart/form-data',
+                               data={'answerFile': (io.BytesIO(pdf), 'answer.pdf', 'application/pdf')})
+        statuses[name] = response.status_code
+    submission = Submission.objects(assignment=assignment.id).first()
+    with client.session_transaction() as session:
+        session['user_id'], session['user_type'] = str(professor.id), 'professor'
+    statuses['delete'] = client.delete(f'/api/submissions/{submission.id}').status_code
+    print(json.dumps({'statuses': statuses, 'modules': sorted(sys.modules)}))
+finally:
+    if db is not None:
+        db.client.drop_database(db.name)
+"""
+
+
+def measure(module):
+    """Return [(name, self_us, cumulative_us, depth)] for every module imported by ``module``."""
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=server_dir, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return imports
+
+
+def request_modules(mongodb_uri):
+    """Return ({request: status}, modules loaded) after upload and delete requests in a web role process."""
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, AUTOASSIGN_ROLE='web', MONGODB_URI=mongodb_uri)
+    completed = subprocess.run(
+        [sys.executable, '-c', REQUEST_SCRIPT],
+        cwd=server_dir, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"request check failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result['statuses'], result['modules']
+
+
+def ml_roots(modules):
+    return sorted({name.split('.')[0] for name in modules if name.split('.')[0] in ML_PACKAGES})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check web tier import time and ML imports')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--mongodb-uri', default=DEFAULT_MONGODB_URI,
+                        help='Empty scratch database for the request check; dropped afterwards')
+    parser.add_argument('--skip-requests', action='store_true', help='Only check the import')
+    args = parser.parse_args()
+
+    imports = measure(args.module)
+    total_us = sum(cumulative for _, _, cumulative, depth in imports if depth == 0)
+    print(f"import {args.module}: {total_us / 1000:.1f} ms, {len(imports)} modules")
+    for name, _, cumulative, _ in sorted(imports, key=lambda item: -item[2])[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    roots = ml_roots(name for name, _, _, _ in imports)
+    if roots:
+        print(f"ML packages imported at startup: {', '.join(roots)}")
+        sys.exit(1)
+    print("No ML packages imported at startup")
+
+    if args.skip_requests:
+        return
+    statuses, modules = request_modules(args.mongodb_uri)
+    print(f"Requests: {', '.join(f'{name} {status}' for name, status in statuses.items())}")
+    if any(status >= 400 for status in statuses.values()):
+        print("A request failed, so its path was not fully exercised")
+        sys.exit(1)
+    roots = ml_roots(modules)
+    if roots:
+        print(f"ML packages imported by upload and delete requests: {', '.join(roots)}")
+        sys.exit(1)
+    print("No ML packages imported by upload and delete requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare per-shingle ``datasketch.MinHash.update`` with the vectorized
+MinHashEngine on a synthetic assignment and check the signatures match:
+
+    python -m benchmarks.minhash_benchmark [--submissions 500] [--words 600]
+"""
+import time
+import random
+import argparse
+import numpy as np
+from datasketch import MinHash
+from ml_models.cheating_detector import CheatingDetector
+
+
+def make_corpus(submissions, words, vocabulary_size=5000, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{index}" for index in range(vocabulary_size)]
+    return [' '.join(rng.choice(vocabulary) for _ in range(words)) for _ in range(submissions)]
+
+
+def datasketch_signatures(detector, texts):
+    signatures = []
+    for text in texts:
+        minhash = MinHash(num_perm=detector.num_perm)
+        for shingle in detector._get_shingles(text, k=2):
+            minhash.update(shingle.encode('utf-8'))
+        signatures.append(minhash.hashvalues)
+    return np.array(signatures, dtype=np.uint64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MinHash signature generation')
+    parser.add_argument('--submissions', type=int, default=500)
+    parser.add_argument('--words', type=int, default=600)
+    parser.add_argument('--num-perm', type=int, default=128)
+    args = parser.parse_args()
+
+    detector = CheatingDetector(num_perm=args.num_perm)
+    texts = make_corpus(args.submissions, args.words)
+
+    started = time.perf_counter()
+    expected = datasketch_signatures(detector, texts)
+    datasketch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = detector.batch_signatures(texts)
+    engine_seconds = time.perf_counter() - started
+
+    print(f"{args.submissions} submissions x {args.words} words, {args.num_perm} permutations")
+    print(f"datasketch per-shingle: {datasketch_seconds * 1000:.1f} ms")
+    print(f"vectorized engine:      {engine_seconds * 1000:.1f} ms "
+          f"({datasketch_seconds / max(engine_seconds, 1e-9):.1f}x)")
+    print(f"signatures identical:   {np.array_equal(expected, actual)}")
+
+
+if __name__ == '__main__':
+    main()
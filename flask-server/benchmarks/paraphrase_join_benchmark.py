@@ -0,0 +1,74 @@
+"""
+Scaling of the blockwise sparse paraphrase join against the dense
+``cosine_similarity`` matrix it replaced, with time and peak memory per n:
+
+    python -m benchmarks.paraphrase_join_benchmark [--sizes 500 1000 2000 5000 10000]
+"""
+import time
+import random
+import argparse
+import tracemalloc
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from ml_models.similarity_join import thresholded_similarity_join
+
+
+def make_corpus(documents, words, vocabulary_size=20000, copy_rate=0.05, seed=0):
+    """Random documents where a share of them are light edits of an earlier one."""
+    rng = random.Random(seed)
+    vocabulary = [f"term{index}" for index in range(vocabulary_size)]
+    corpus = []
+    for _ in range(documents):
+        if corpus and rng.random() < copy_rate:
+            source = rng.choice(corpus).split()
+            for _ in range(len(source) // 10):
+                source[rng.randrange(len(source))] = rng.choice(vocabulary)
+            corpus.append(' '.join(source))
+        else:
+            corpus.append(' '.join(rng.choice(vocabulary) for _ in range(words)))
+    return corpus
+
+
+def measure(function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+def dense_pairs(matrix, threshold):
+    similarities = cosine_similarity(matrix)
+    rows, cols = np.nonzero(np.triu(similarities, k=1) >= threshold)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the paraphrase similarity join')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000, 5000, 10000])
+    parser.add_argument('--words', type=int, default=300)
+    parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--top-k', type=int, default=None)
+    parser.add_argument('--dense-max', type=int, default=5000,
+                        help='Largest n for which the dense matrix is also measured')
+    args = parser.parse_args()
+
+    print(f"{'n':>7} {'pairs':>7} {'join ms':>9} {'join MB':>8} {'dense ms':>9} {'dense MB':>9}")
+    for size in args.sizes:
+        matrix = TfidfVectorizer().fit_transform(make_corpus(size, args.words))
+        (rows, _, _), join_seconds, join_mb = measure(
+            lambda: thresholded_similarity_join(matrix, args.threshold, top_k=args.top_k))
+
+        dense = '-', '-'
+        if size <= args.dense_max:
+            _, dense_seconds, dense_mb = measure(lambda: dense_pairs(matrix, args.threshold))
+            dense = f"{dense_seconds * 1000:.0f}", f"{dense_mb:.1f}"
+
+        print(f"{size:>7} {len(rows):>7} {join_seconds * 1000:>9.0f} {join_mb:>8.1f} {dense[0]:>9} {dense[1]:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the SimilarityChecker inference backends on CPU: sentences/sec, RSS
+after loading and encoding, and the drift of pair similarity scores from the
+full-precision torch backend:
+
+    python -m benchmarks.similarity_backend_benchmark [--backends torch,int8,onnx,onnx-int8]
+        [--sentences 512] [--max-drift 0.02]
+
+Each backend runs in its own process so RSS figures do not overlap. Exits
+with status 1 if any backend drifts further than ``--max-drift``.
+"""
+import sys
+import time
+import random
+import argparse
+import multiprocessing
+import numpy as np
+from ml_models.inference_backends import BACKENDS
+from ml_models.model_registry import DEFAULT_MODEL
+
+VOCABULARY = (
+    "the cell membrane controls which molecules enter and leave while mitochondria produce energy "
+    "through respiration photosynthesis converts light into chemical energy stored as glucose an "
+    "algorithm sorts the list by comparing adjacent elements and swapping them until no swaps remain "
+    "demand rises when prices fall supply increases as producers expect higher profits the market "
+    "reaches equilibrium where both curves intersect force equals mass times acceleration momentum "
+    "is conserved in a closed system"
+).split()
+
+
+def make_pairs(sentences, words=40, seed=0):
+    """Sentence pairs whose second half is the first with some words replaced."""
+    rng = random.Random(seed)
+    texts = []
+    for index in range(sentences // 2):
+        first = [rng.choice(VOCABULARY) for _ in range(words)]
+        # Replace between 0% and 100% of the words for a spread of similarities
+        changed = int(words * index / max(1, sentences // 2 - 1))
+        second = list(first)
+        for position in rng.sample(range(words), changed):
+            second[position] = rng.choice(VOCABULARY)
+        texts.extend([' '.join(first), ' '.join(second)])
+    return texts
+
+
+def run_backend(backend, model_name, texts, batch_size):
+    from ml_models.inference_backends import load_encoder
+    from ml_models.model_registry import _current_rss_bytes
+
+    rss_before = _current_rss_bytes()
+    started = time.perf_counter()
+    encoder = load_encoder(model_name, backend)
+    load_seconds = time.perf_counter() - started
+    encoder.encode(texts[:batch_size], batch_size=batch_size, normalize_embeddings=True)
+
+    started = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    encode_seconds = time.perf_counter() - started
+    return {
+        'backend': backend,
+        'load_seconds': load_seconds,
+        'sentences_per_second': len(texts) / max(encode_seconds, 1e-9),
+        'rss_mb': _current_rss_bytes() / (1024 * 1024),
+        'rss_delta_mb': max(0, _current_rss_bytes() - rss_before) / (1024 * 1024),
+        'embeddings': np.asarray(embeddings, dtype=np.float32)
+    }
+
+
+def pair_scores(embeddings):
+    return np.einsum('ij,ij->i', embeddings[0::2], embeddings[1::2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SimilarityChecker inference backends')
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--sentences', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-drift', type=float, default=0.02,
+                        help='Largest allowed absolute score difference from the torch backend')
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    if 'torch' not in backends:
+        backends.insert(0, 'torch')
+    texts = make_pairs(args.sentences)
+
+    # spawn: every backend starts from a fresh interpreter
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for backend in backends:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_backend, (backend, args.model, texts, args.batch_size)))
+
+    reference = pair_scores(results[0]['embeddings'])
+    print(f"{len(texts)} sentences, model {args.model}, batch size {args.batch_size}")
+    print(f"{'backend':<10} {'load s':>7} {'sent/s':>9} {'RSS MB':>8} {'+RSS MB':>8} {'max drift':>10} {'mean drift':>11}")
+    failed = False
+    for result in results:
+        drift = np.abs(pair_scores(result['embeddings']) - reference)
+        failed |= bool(drift.max() > args.max_drift)
+        print(f"{result['backend']:<10} {result['load_seconds']:>7.2f} {result['sentences_per_second']:>9.1f} "
+              f"{result['rss_mb']:>8.1f} {result['rss_delta_mb']:>8.1f} {drift.max():>10.4f} {drift.mean():>11.4f}")
+    if failed:
+        print(f"Score drift above {args.max_drift}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,40 @@ class Config:
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
     
+    # Process role: 'web' serves the API without loading models or running jobs,
+    # 'worker' runs processing jobs and models without the API blueprints, and
+    # 'all' does both in one process (local development, single container)
+    ROLE = os.environ.get('AUTOASSIGN_ROLE', 'all')
+    if ROLE not in ('web', 'worker', 'all'):
+        raise ValueError(f"AUTOASSIGN_ROLE must be 'web', 'worker' or 'all', not '{ROLE}'")
+    SERVES_API = ROLE in ('web', 'all')
+    RUNS_JOBS = ROLE in ('worker', 'all')
+    # Load models right after start so the first job does not pay for it
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1' if RUNS_JOBS else '0') == '1'
+    
+    # Submission processing queue (see worker.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Concurrent jobs per worker process
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+    JOB_QUEUE_MAX_PENDING = int(os.environ.get('JOB_QUEUE_MAX_PENDING', 1000))
+    
+    # OCR result cache, keyed by PDF SHA-256 and OCR engine version
+    OCR_CACHE_MAX_BYTES = int(os.environ.get('OCR_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    OCR_CACHE_EVICT_INTERVAL = int(os.environ.get('OCR_CACHE_EVICT_INTERVAL', 300))  # Seconds between size checks
+    
+    # Plagiarism: per-upload pre-screen against the assignment's indexes; the
+    # full check is the assignment-wide analysis (POST .../plagiarism/analysis)
+    PLAGIARISM_PRESCREEN = os.environ.get('PLAGIARISM_PRESCREEN', '1') == '1'
+    # Embedding cosine similarity at which two submissions are semantic near-duplicates,
+    # used by both the pre-screen and the assignment-wide analysis
+    PLAGIARISM_SEMANTIC_THRESHOLD = float(os.environ.get('PLAGIARISM_SEMANTIC_THRESHOLD', 0.9))
+    
+    # Cross-assignment reuse detection against every fingerprinted submission
+    FINGERPRINT_SCOPE = os.environ.get('FINGERPRINT_SCOPE', 'course')  # 'course' or 'global'
+    FINGERPRINT_WINDOW_DAYS = int(os.environ.get('FINGERPRINT_WINDOW_DAYS', 3 * 365))  # 0 = no limit
+    FINGERPRINT_MAX_CANDIDATES = int(os.environ.get('FINGERPRINT_MAX_CANDIDATES', 200))
+    
     # CORS settings
     CORS_HEADERS = 'Content-Type'
     CORS_ORIGINS = ['http://localhost:3000', 'http://localhost:3001']
@@ -1,9 +1,14 @@
 import os
 
+from config import Config
+
 # Worker Options
-workers = 4
+# 'web' processes only serve requests, so several workers handle latency; the
+# 'worker'/'all' roles also run jobs and hold a model per process, so they
+# default to a single process whose job threads share one model
+workers = int(os.getenv("GUNICORN_WORKERS", 4 if Config.ROLE == 'web' else 1))
 worker_class = 'sync'
-threads = 2
+threads = int(os.getenv("GUNICORN_THREADS", 2 if Config.ROLE == 'web' else 4))
 timeout = 120
 
 # Server Socket
@@ -22,5 +27,25 @@ loglevel = 'info'
 # App module specification
 wsgi_app = 'app:app'
 
+# Roles that run jobs load ML models and start their job threads in each
+# worker right after fork (never in the master, whose threads would not
+# survive the fork); 'web' workers never load models
 def on_starting(server):
-    server.log.info("Starting Assignment Checker API server")
+    server.log.info(f"Starting Assignment Checker API server (role {Config.ROLE})")
+    if Config.RUNS_JOBS:
+        server.log.info(f"Job threads and models ({'warmed up' if Config.MODEL_WARMUP else 'lazy'}) start in each worker after fork")
+
+def post_fork(server, worker):
+    if not Config.RUNS_JOBS:
+        return
+    from worker import start_embedded
+    start_embedded()
+    from ml_models.model_registry import model_registry
+    server.log.info(f"Worker {worker.pid} running jobs, model stats: {model_registry.stats()}")
+
+def worker_exit(server, worker):
+    if not Config.RUNS_JOBS:
+        return
+    # Jobs still running are retried by another worker once their lease expires
+    from worker import stop_embedded
+    stop_embedded()
@@ -0,0 +1,156 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Below this many vectors an exact scan is faster than probing clusters
+DEFAULT_IVF_MIN_SIZE = 4096
+DEFAULT_NPROBE = 8
+
+
+def pack_embedding(embedding: np.ndarray) -> bytes:
+    """Pack an embedding as little-endian float16 (384 dims -> 768 bytes)."""
+    return np.asarray(embedding, dtype='<f2').tobytes()
+
+
+def unpack_embedding(data: bytes) -> np.ndarray:
+    """Rebuild an L2-normalized float32 embedding from ``pack_embedding`` output."""
+    vector = np.frombuffer(data, dtype='<f2').astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def pack_embeddings(matrix: np.ndarray) -> bytes:
+    """Pack a (rows, dim) embedding matrix as a uint32 dim header plus float16 values."""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype='<f2'))
+    return np.uint32(matrix.shape[1]).astype('<u4').tobytes() + matrix.tobytes()
+
+
+def unpack_embeddings(data: bytes) -> np.ndarray:
+    """Rebuild a row-normalized float32 matrix from ``pack_embeddings`` output."""
+    dim = int(np.frombuffer(data, dtype='<u4', count=1)[0])
+    matrix = np.frombuffer(data, dtype='<f2', offset=4).astype(np.float32).reshape(-1, dim)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    def __init__(self, ivf_min_size: int = DEFAULT_IVF_MIN_SIZE, nprobe: int = DEFAULT_NPROBE, seed: int = 0):
+        """
+        In-process cosine nearest-neighbour index over normalized embeddings.
+
+        Small indexes are scanned exactly with one matrix-vector product. Once
+        the index reaches ``ivf_min_size`` vectors it is partitioned with
+        k-means into ~sqrt(n) inverted lists and a query only scans the
+        ``nprobe`` lists closest to it. The partition is retrained when the
+        index has doubled in size since the last training.
+
+        Args:
+            ivf_min_size (int): Size from which the IVF partition is used
+            nprobe (int): Inverted lists scanned per query
+            seed (int): Seed of the k-means initialisation
+        """
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+        self.seed = seed
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors = None  # (capacity, dim) float32, first len(ids) rows used
+        self.centroids = None
+        self.assignments = None  # Inverted list of every row
+        self.trained_size = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, item_id: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.vectors is not None and self.vectors.shape[1] != len(vector):
+            # Embedding model changed: start over with the new dimension
+            self.__init__(self.ivf_min_size, self.nprobe, self.seed)
+
+        row = self.rows.get(item_id)
+        if row is None:
+            row = len(self.ids)
+            self._reserve(row + 1, len(vector))
+            self.ids.append(item_id)
+            self.rows[item_id] = row
+        self.vectors[row] = vector
+        if self.centroids is not None:
+            self.assignments[row] = int(np.argmax(self.centroids @ vector))
+
+    def remove(self, item_id: str):
+        row = self.rows.pop(item_id, None)
+        if row is None:
+            return
+        # Move the last row into the hole
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+            self.vectors[row] = self.vectors[last]
+            if self.assignments is not None:
+                self.assignments[row] = self.assignments[last]
+        self.ids.pop()
+
+    def _reserve(self, size, dim):
+        if self.vectors is None:
+            self.vectors = np.zeros((max(16, size), dim), dtype=np.float32)
+            self.assignments = None
+        elif size > len(self.vectors):
+            capacity = max(size, 2 * len(self.vectors))
+            self.vectors = np.vstack([self.vectors, np.zeros((capacity - len(self.vectors), dim), dtype=np.float32)])
+            if self.assignments is not None:
+                self.assignments = np.concatenate([self.assignments, np.zeros(capacity - len(self.assignments), dtype=np.int32)])
+
+    def _train(self, iterations: int = 10):
+        """Partition the vectors into inverted lists with spherical k-means."""
+        count = len(self.ids)
+        vectors = self.vectors[:count]
+        n_lists = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(count, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids
+        self.assignments = np.zeros(len(self.vectors), dtype=np.int32)
+        self.assignments[:count] = np.argmax(vectors @ centroids.T, axis=1)
+        self.trained_size = count
+
+    def query(self, vector: np.ndarray, threshold: float = 0.0, top_k: int = 10,
+              exclude: str = None) -> List[Tuple[str, float]]:
+        """
+        Most similar indexed items by cosine similarity.
+
+        Args:
+            vector (np.ndarray): Normalized query embedding
+            threshold (float): Minimum similarity of a result
+            top_k (int): Maximum number of results
+            exclude (str): Item id to leave out (e.g. the query itself)
+
+        Returns:
+            List[Tuple[str, float]]: (item id, similarity), best first
+        """
+        count = len(self.ids)
+        if count == 0:
+            return []
+        vector = np.asarray(vector, dtype=np.float32)
+
+        if count >= self.ivf_min_size:
+            if self.centroids is None or count >= 2 * self.trained_size:
+                self._train()
+            probes = np.argsort(-(self.centroids @ vector))[:self.nprobe]
+            candidates = np.flatnonzero(np.isin(self.assignments[:count], probes))
+        else:
+            candidates = np.arange(count)
+
+        scores = self.vectors[candidates] @ vector
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores)[:top_k + 1]
+        results = [(self.ids[candidates[i]], float(scores[i])) for i in order if self.ids[candidates[i]] != exclude]
+        return results[:top_k]
@@ -1,23 +1,38 @@
-from datasketch import MinHash, MinHashLSH
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from typing import List, Dict, Set, Tuple
 import logging
 import string
-try:
-    from nltk.corpus import stopwords
-    STOPWORDS = set(stopwords.words('english'))
-except Exception:
-    STOPWORDS = set([
-        'the', 'and', 'is', 'in', 'it', 'of', 'to', 'a', 'an', 'for', 'on', 'with', 'as', 'by', 'at', 'from', 'that', 'this', 'be', 'or', 'are', 'was', 'were', 'but', 'not', 'have', 'has', 'had', 'they', 'you', 'we', 'he', 'she', 'him', 'her', 'his', 'their', 'them', 'our', 'us', 'can', 'will', 'would', 'should', 'could', 'may', 'might', 'do', 'does', 'did', 'so', 'if', 'then', 'than', 'which', 'who', 'whom', 'what', 'when', 'where', 'why', 'how', 'all', 'any', 'some', 'no', 'nor', 'more', 'most', 'such', 'only', 'own', 'same', 'too', 'very', 'just', 'over', 'under', 'again', 'further', 'here', 'there', 'because', 'about', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'up', 'down', 'out', 'off', 'over', 'under', 'once'
-    ])
+from ml_models.minhash_engine import MinHashEngine
+from ml_models.copy_clusters import build_clusters
+
+# Used when NLTK or its stopword corpus is not installed
+FALLBACK_STOPWORDS = set([
+    'the', 'and', 'is', 'in', 'it', 'of', 'to', 'a', 'an', 'for', 'on', 'with', 'as', 'by', 'at', 'from', 'that', 'this', 'be', 'or', 'are', 'was', 'were', 'but', 'not', 'have', 'has', 'had', 'they', 'you', 'we', 'he', 'she', 'him', 'her', 'his', 'their', 'them', 'our', 'us', 'can', 'will', 'would', 'should', 'could', 'may', 'might', 'do', 'does', 'did', 'so', 'if', 'then', 'than', 'which', 'who', 'whom', 'what', 'when', 'where', 'why', 'how', 'all', 'any', 'some', 'no', 'nor', 'more', 'most', 'such', 'only', 'own', 'same', 'too', 'very', 'just', 'over', 'under', 'again', 'further', 'here', 'there', 'because', 'about', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'up', 'down', 'out', 'off', 'over', 'under', 'once'
+])
+_stopwords = None
+
+
+def get_stopwords() -> Set[str]:
+    """English stopwords, from NLTK when available; loaded on first use."""
+    global _stopwords
+    if _stopwords is None:
+        try:
+            from nltk.corpus import stopwords
+            _stopwords = set(stopwords.words('english'))
+        except Exception:
+            _stopwords = FALLBACK_STOPWORDS
+    return _stopwords
+
+
+# Built once instead of on every _preprocess_text call
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
 
 class CheatingDetector:
     def __init__(self, 
                  num_perm: int = 128,
                  exact_threshold: float = 0.5,
-                 paraphrase_threshold: float = 0.7):
+                 paraphrase_threshold: float = 0.7,
+                 semantic_threshold: float = 0.9):
         """
         Initialize the cheating detector.
         
@@ -25,22 +40,20 @@ class CheatingDetector:
             num_perm (int): Number of permutations for MinHash
             exact_threshold (float): Threshold for exact copy detection
             paraphrase_threshold (float): Threshold for paraphrase detection
+            semantic_threshold (float): Embedding cosine similarity for semantic near-duplicates
         """
         self.num_perm = num_perm
         self.exact_threshold = exact_threshold
         self.paraphrase_threshold = paraphrase_threshold
+        self.semantic_threshold = semantic_threshold
         
-        # Initialize LSH index
-        self.lsh = MinHashLSH(threshold=exact_threshold, num_perm=num_perm)
-        
-        # Initialize TF-IDF vectorizer
-        self.tfidf = TfidfVectorizer(
-            strip_accents='unicode',
-            lowercase=True,
-            analyzer='word',
-            ngram_range=(1, 3),
-            max_features=5000
-        )
+        # Vectorized MinHash, signatures are compatible with datasketch 1.x
+        self.minhash_engine = MinHashEngine(num_perm=num_perm)
+
+        # LSH index and TF-IDF vectorizer are built on first use, so importing
+        # or constructing the detector does not load datasketch or sklearn
+        self.lsh = None
+        self._tfidf = None
         
         # Configure logging
         logging.basicConfig(level=logging.INFO)
@@ -49,9 +62,10 @@ class CheatingDetector:
     def _preprocess_text(self, text: str) -> str:
         """Lowercase, remove punctuation, and stopwords from text."""
         text = text.lower()
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        text = text.translate(PUNCTUATION_TABLE)
         words = text.split()
-        words = [w for w in words if w not in STOPWORDS]
+        stop = get_stopwords()
+        words = [w for w in words if w not in stop]
         return ' '.join(words)
 
     def _get_shingles(self, text: str, k: int = 5):
@@ -60,7 +74,21 @@ class CheatingDetector:
         words = preprocessed.split()
         return [' '.join(words[i:i+k]) for i in range(len(words)-k+1)]
 
-    def _create_minhash(self, text: str) -> MinHash:
+    @property
+    def tfidf(self):
+        """TF-IDF vectorizer used by ``detect_paraphrases``."""
+        if self._tfidf is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._tfidf = TfidfVectorizer(
+                strip_accents='unicode',
+                lowercase=True,
+                analyzer='word',
+                ngram_range=(1, 3),
+                max_features=5000
+            )
+        return self._tfidf
+
+    def _create_minhash(self, text: str) -> 'MinHash':
         """
         Create a MinHash object for a text.
         
@@ -70,56 +98,107 @@ class CheatingDetector:
         Returns:
             MinHash: MinHash object
         """
-        minhash = MinHash(num_perm=self.num_perm)
-        for shingle in self._get_shingles(text, k=2):
-            minhash.update(shingle.encode('utf-8'))
-        return minhash
+        from datasketch import MinHash
+        return MinHash(num_perm=self.num_perm, hashvalues=self.minhash_engine.signature(self._get_shingles(text, k=2)))
+
+    def batch_signatures(self, texts: List[str]) -> np.ndarray:
+        """
+        Compute the MinHash signatures of many texts in one vectorized pass.
+        
+        Args:
+            texts (List[str]): Input texts
+            
+        Returns:
+            np.ndarray: (texts, num_perm) uint64 array of hash values
+        """
+        return self.minhash_engine.signatures([self._get_shingles(text, k=2) for text in texts])
+
+    def signature_bytes(self, text: str) -> bytes:
+        """
+        Compute the MinHash signature of a text packed as little-endian uint32.
+
+        MinHash hash values never exceed 32 bits, so the packing is lossless and
+        a 128-permutation signature takes 512 bytes.
+        
+        Args:
+            text (str): Input text
+            
+        Returns:
+            bytes: Packed signature
+        """
+        return self.batch_signature_bytes([text])[0]
+
+    def batch_signature_bytes(self, texts: List[str]) -> List[bytes]:
+        """Packed signatures (see ``signature_bytes``) of many texts."""
+        packed = self.batch_signatures(texts).astype('<u4')
+        return [row.tobytes() for row in packed]
+
+    def minhash_from_signature(self, signature: bytes) -> 'MinHash':
+        """
+        Rebuild a MinHash object from a packed signature without re-hashing any text.
+        
+        Args:
+            signature (bytes): Signature produced by ``signature_bytes``
+            
+        Returns:
+            MinHash: MinHash object usable with ``MinHashLSH``
+        """
+        hashvalues = np.frombuffer(signature, dtype='<u4').astype(np.uint64)
+        from datasketch import MinHash
+        return MinHash(num_perm=len(hashvalues), hashvalues=hashvalues)
+
+    @staticmethod
+    def signature_similarity(signature1: bytes, signature2: bytes) -> float:
+        """Estimate the Jaccard similarity of two packed signatures."""
+        values1 = np.frombuffer(signature1, dtype='<u4')
+        values2 = np.frombuffer(signature2, dtype='<u4')
+        if len(values1) != len(values2) or len(values1) == 0:
+            return 0.0
+        return float(np.count_nonzero(values1 == values2)) / len(values1)
 
     def detect_exact_copies(self, submissions: List[Dict]) -> List[Dict]:
         """
         Detect exact copies among submissions using MinHash LSH.
         
+        Every LSH candidate whose estimated Jaccard similarity reaches the
+        threshold becomes one pair; groups are formed by ``build_clusters``.
+        
         Args:
             submissions (List[Dict]): List of submission dictionaries with 'id' and 'text' keys
             
         Returns:
-            List[Dict]: List of detected exact copies with their details
+            List[Dict]: List of detected exact copy pairs with their details
         """
+        from datasketch import MinHash, MinHashLSH
         try:
             # Clear existing LSH index
             self.lsh = MinHashLSH(threshold=self.exact_threshold, num_perm=self.num_perm)
             
             exact_copies = []
-            processed_ids = set()
+            signatures = self.batch_signatures([submission['text'] for submission in submissions])
+            rows = {}
             
             # Process each submission
-            for submission in submissions:
+            for row, (submission, hashvalues) in enumerate(zip(submissions, signatures)):
                 submission_id = submission['id']
-                text = submission['text']
-                
-                if submission_id in processed_ids:
+                if submission_id in rows:
                     continue
                 
-                minhash = self._create_minhash(text)
+                minhash = MinHash(num_perm=self.num_perm, hashvalues=hashvalues)
                 
                 # Query similar items before inserting
-                similar_ids = self.lsh.query(minhash)
-                
-                if similar_ids:
-                    # Found exact copies
-                    copies_group = {submission_id}
-                    copies_group.update(similar_ids)
-                    
-                    exact_copies.append({
-                        'type': 'exact_copy',
-                        'submission_ids': list(copies_group),
-                        'similarity_score': 1.0
-                    })
-                    
-                    processed_ids.update(copies_group)
+                for similar_id in self.lsh.query(minhash):
+                    similarity = float(np.mean(signatures[rows[similar_id]] == hashvalues))
+                    if similarity >= self.exact_threshold:
+                        exact_copies.append({
+                            'type': 'exact_copy',
+                            'submission_ids': [similar_id, submission_id],
+                            'similarity_score': similarity
+                        })
                 
                 # Insert the current submission
                 self.lsh.insert(submission_id, minhash)
+                rows[submission_id] = row
             
             return exact_copies
             
@@ -127,72 +206,106 @@ class CheatingDetector:
             self.logger.error(f"Error detecting exact copies: {str(e)}")
             return []
 
-    def detect_paraphrases(self, submissions: List[Dict]) -> List[Dict]:
+    def detect_paraphrases(self, submissions: List[Dict], top_k: int = None) -> List[Dict]:
         """
         Detect paraphrased content using TF-IDF and cosine similarity.
         
         Args:
             submissions (List[Dict]): List of submission dictionaries with 'id' and 'text' keys
+            top_k (int): Only report each submission's ``top_k`` closest matches
             
         Returns:
             List[Dict]: List of detected paraphrases with their details
         """
+        from ml_models.similarity_join import thresholded_similarity_join
         try:
             texts = [sub['text'] for sub in submissions]
             submission_ids = [sub['id'] for sub in submissions]
             
-            # Create TF-IDF matrix
+            # Create TF-IDF matrix (rows are L2-normalized, so dot products are cosines)
             tfidf_matrix = self.tfidf.fit_transform(texts)
             
-            # Compute pairwise similarities
-            similarities = cosine_similarity(tfidf_matrix)
-            
-            paraphrases = []
-            processed_pairs = set()
-            
-            # Find similar pairs
-            for i in range(len(submissions)):
-                for j in range(i + 1, len(submissions)):
-                    if (i, j) in processed_pairs:
-                        continue
-                        
-                    similarity = similarities[i][j]
-                    
-                    if similarity >= self.paraphrase_threshold:
-                        paraphrases.append({
-                            'type': 'paraphrase',
-                            'submission_ids': [submission_ids[i], submission_ids[j]],
-                            'similarity_score': float(similarity)
-                        })
-                        
-                        processed_pairs.add((i, j))
-                        processed_pairs.add((j, i))
+            # Blockwise sparse join, only pairs above the threshold are materialized
+            rows, cols, scores = thresholded_similarity_join(
+                tfidf_matrix, self.paraphrase_threshold, top_k=top_k
+            )
             
-            return paraphrases
+            return [
+                {
+                    'type': 'paraphrase',
+                    'submission_ids': [submission_ids[i], submission_ids[j]],
+                    'similarity_score': float(score)
+                }
+                for i, j, score in zip(rows, cols, scores)
+            ]
             
         except Exception as e:
             self.logger.error(f"Error detecting paraphrases: {str(e)}")
             return []
 
+    def detect_semantic(self, submissions: List[Dict], top_k: int = 10, block_size: int = 256) -> List[Dict]:
+        """
+        Detect semantic near-duplicates by the cosine similarity of submission embeddings.
+
+        Catches synonym-level rewrites TF-IDF misses, like the per-upload
+        pre-screen's embedding query.
+
+        Args:
+            submissions (List[Dict]): Submission dictionaries with 'id' and an
+                L2-normalized 'embedding' (None when missing)
+            top_k (int): Only report each submission's ``top_k`` closest matches
+            block_size (int): Rows compared against all others at a time
+
+        Returns:
+            List[Dict]: List of detected semantic matches with their details
+        """
+        embedded = [sub for sub in submissions if sub.get('embedding') is not None]
+        if len(embedded) < 2:
+            return []
+        matrix = np.vstack([sub['embedding'] for sub in embedded]).astype(np.float32)
+        pairs = {}
+        for start in range(0, len(embedded), block_size):
+            # Only a block_size x n slice of the similarities exists at a time
+            similarities = matrix[start:start + block_size] @ matrix.T
+            for offset, row in enumerate(similarities):
+                i = start + offset
+                row[i] = -1.0
+                candidates = np.flatnonzero(row >= self.semantic_threshold)
+                for j in candidates[np.argsort(-row[candidates])][:top_k]:
+                    pairs[(min(i, j), max(i, j))] = float(row[j])
+        return [
+            {
+                'type': 'semantic',
+                'submission_ids': [embedded[i]['id'], embedded[j]['id']],
+                'similarity_score': score
+            }
+            for (i, j), score in sorted(pairs.items(), key=lambda item: -item[1])
+        ]
+
     def analyze_submissions(self, submissions: List[Dict]) -> Dict:
         """
-        Analyze submissions for both exact copies and paraphrases.
+        Analyze submissions for exact copies, paraphrases and semantic near-duplicates.
         
         Args:
-            submissions (List[Dict]): List of submission dictionaries with 'id' and 'text' keys
+            submissions (List[Dict]): List of submission dictionaries with 'id' and 'text'
+                keys, and optionally an 'embedding'
             
         Returns:
-            Dict: Analysis results including detected copies and statistics
+            Dict: Analysis results including detected copies, copy-ring clusters and statistics
         """
         try:
-            # Detect both types of copying
+            # Detect every type of copying
             exact_copies = self.detect_exact_copies(submissions)
             paraphrases = self.detect_paraphrases(submissions)
+            semantic_matches = self.detect_semantic(submissions)
+            
+            # Connected copy rings over all kinds of edges
+            clusters = build_clusters(exact_copies + paraphrases + semantic_matches)
             
             # Collect all suspicious submissions
             suspicious_ids = set()
-            for case in exact_copies + paraphrases:
-                suspicious_ids.update(case['submission_ids'])
+            for cluster in clusters:
+                suspicious_ids.update(cluster['submission_ids'])
             
             # Calculate statistics
             stats = {
@@ -200,12 +313,17 @@ class CheatingDetector:
                 'suspicious_submissions': len(suspicious_ids),
                 'exact_copy_cases': len(exact_copies),
                 'paraphrase_cases': len(paraphrases),
+                'semantic_cases': len(semantic_matches),
+                'clusters': len(clusters),
+                'largest_cluster': max((cluster['size'] for cluster in clusters), default=0),
                 'suspicious_percentage': round(len(suspicious_ids) * 100 / len(submissions), 2)
             }
             
             return {
                 'exact_copies': exact_copies,
                 'paraphrases': paraphrases,
+                'semantic_matches': semantic_matches,
+                'clusters': clusters,
                 'statistics': stats,
                 'suspicious_ids': list(suspicious_ids)
             }
@@ -216,6 +334,8 @@ class CheatingDetector:
                 'error': str(e),
                 'exact_copies': [],
                 'paraphrases': [],
+                'semantic_matches': [],
+                'clusters': [],
                 'statistics': {},
                 'suspicious_ids': []
             }
@@ -230,7 +350,8 @@ class CheatingDetector:
         """
         if exact is not None:
             self.exact_threshold = max(0.0, min(1.0, exact))
-            self.lsh = MinHashLSH(threshold=self.exact_threshold, num_perm=self.num_perm)
+            # Rebuilt with the new threshold on the next detect_exact_copies
+            self.lsh = None
             
         if paraphrase is not None:
             self.paraphrase_threshold = max(0.0, min(1.0, paraphrase)) 
\ No newline at end of file
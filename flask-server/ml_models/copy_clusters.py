@@ -0,0 +1,72 @@
+from typing import Dict, Hashable, Iterable, List
+
+
+class UnionFind:
+    """Disjoint-set forest with union by size and path halving."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def add(self, item: Hashable):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item: Hashable) -> Hashable:
+        self.add(item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first: Hashable, second: Hashable) -> Hashable:
+        root1, root2 = self.find(first), self.find(second)
+        if root1 == root2:
+            return root1
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        return root1
+
+
+def build_clusters(edges: Iterable[Dict]) -> List[Dict]:
+    """
+    Group submissions connected by detection edges into copy rings.
+
+    Args:
+        edges (Iterable[Dict]): Edges with 'submission_ids' (a pair), 'type' and
+            'similarity_score' keys, e.g. exact-copy and paraphrase matches
+
+    Returns:
+        List[Dict]: One entry per connected cluster with its sorted member ids,
+        edge types and min/max/mean edge score, largest clusters first
+    """
+    forest = UnionFind()
+    edges = [edge for edge in edges if len(edge['submission_ids']) == 2]
+    for edge in edges:
+        forest.union(*edge['submission_ids'])
+
+    grouped: Dict[Hashable, Dict] = {}
+    for edge in edges:
+        root = forest.find(edge['submission_ids'][0])
+        cluster = grouped.setdefault(root, {'members': set(), 'types': set(), 'scores': []})
+        cluster['members'].update(edge['submission_ids'])
+        cluster['types'].add(edge['type'])
+        cluster['scores'].append(float(edge['similarity_score']))
+
+    clusters = [
+        {
+            'submission_ids': sorted(cluster['members']),
+            'size': len(cluster['members']),
+            'edge_count': len(cluster['scores']),
+            'types': sorted(cluster['types']),
+            'min_score': min(cluster['scores']),
+            'max_score': max(cluster['scores']),
+            'mean_score': sum(cluster['scores']) / len(cluster['scores'])
+        }
+        for cluster in grouped.values()
+    ]
+    clusters.sort(key=lambda cluster: (-cluster['size'], -cluster['max_score'], cluster['submission_ids']))
+    return clusters
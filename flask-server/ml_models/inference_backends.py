@@ -0,0 +1,168 @@
+import os
+import logging
+from typing import List
+
+import numpy as np
+
+# 'torch': full-precision SentenceTransformer
+# 'int8': SentenceTransformer with Linear layers dynamically quantized to int8
+# 'onnx': transformer exported once to ONNX and run with onnxruntime
+# 'onnx-int8': the ONNX export with int8 dynamically quantized weights
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = os.environ.get('SIMILARITY_BACKEND', 'torch')
+# Exported ONNX models are written here once and reused by every process
+DEFAULT_ONNX_DIR = os.environ.get(
+    'SIMILARITY_ONNX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'autoassign', 'onnx')
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_encoder(model_name: str, backend: str = DEFAULT_BACKEND):
+    """
+    Load ``model_name`` for inference with the given backend.
+
+    Every backend returns an object with a ``device`` attribute and a
+    SentenceTransformer-compatible ``encode(texts, convert_to_numpy=True,
+    normalize_embeddings=False, batch_size=32)``.
+
+    Args:
+        model_name (str): Name of the pre-trained model
+        backend (str): One of ``BACKENDS``
+
+    Returns:
+        The loaded encoder
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown similarity backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    if backend in ('onnx', 'onnx-int8'):
+        model = SentenceTransformer(model_name, device='cpu')
+        return OnnxEncoder(model, model_name, quantize=backend == 'onnx-int8')
+
+    device = 'cuda' if torch.cuda.is_available() and backend == 'torch' else 'cpu'
+    model = SentenceTransformer(model_name, device=device)
+    model.eval()
+    if backend == 'int8':
+        # Dynamic quantization runs on CPU only
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class OnnxEncoder:
+    def __init__(self, model, model_name: str, quantize: bool = False, export_dir: str = None):
+        """
+        Run a SentenceTransformer's transformer through onnxruntime.
+
+        The transformer is exported to ``export_dir`` the first time and the
+        export is reused afterwards; with ``quantize`` the exported weights
+        are dynamically quantized to int8. Tokenization and pooling mirror the
+        SentenceTransformer pipeline, so embeddings match the torch backend up
+        to numerical precision.
+
+        Args:
+            model (SentenceTransformer): Loaded model to export
+            model_name (str): Name the export is stored under
+            quantize (bool): Quantize the exported model to int8
+            export_dir (str): Directory holding exported models
+        """
+        import onnxruntime
+
+        self.device = 'cpu'
+        self.tokenizer = model.tokenizer
+        self.max_seq_length = model.max_seq_length
+        self.pooling_mode = self._pooling_mode(model)
+        self.input_names = list(self.tokenizer.model_input_names)
+
+        export_dir = export_dir or DEFAULT_ONNX_DIR
+        base_path = os.path.join(export_dir, model_name.replace('/', '__'))
+        path = base_path + ('-int8.onnx' if quantize else '.onnx')
+        if not os.path.exists(path):
+            if not os.path.exists(base_path + '.onnx'):
+                self._export(model, base_path + '.onnx')
+            if quantize:
+                self._quantize(base_path + '.onnx', path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.path = path
+
+    @staticmethod
+    def _pooling_mode(model) -> str:
+        pooling = model[1]
+        if getattr(pooling, 'pooling_mode_mean_tokens', False):
+            return 'mean'
+        if getattr(pooling, 'pooling_mode_cls_token', False):
+            return 'cls'
+        raise ValueError("ONNX backend supports mean or CLS pooling only")
+
+    def _export(self, model, path: str):
+        import torch
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        transformer = model[0].auto_model.eval()
+        input_names = self.input_names
+
+        class _Wrapper(torch.nn.Module):
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, *inputs):
+                return self.inner(**dict(zip(input_names, inputs)))[0]
+
+        sample = self.tokenizer(['export'], padding=True, return_tensors='pt')
+        axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+        # Write to a temporary name so concurrent workers never load a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                _Wrapper(transformer), tuple(sample[name] for name in input_names), tmp_path,
+                input_names=input_names, output_names=['last_hidden_state'],
+                dynamic_axes=axes, opset_version=14
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Exported ONNX model to {path}")
+
+    @staticmethod
+    def _quantize(source: str, path: str):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        quantize_dynamic(source, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, path)
+        logger.info(f"Quantized ONNX model to {path}")
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """Encode texts into (texts, dim) float32 embeddings."""
+        single = isinstance(texts, str)
+        texts: List[str] = [texts] if single else list(texts)
+        # Sort by length so each batch pads to similar sizes
+        order = np.argsort([-len(text) for text in texts])
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[index] for index in order[start:start + batch_size]]
+            features = self.tokenizer(batch, padding=True, truncation=True,
+                                      max_length=self.max_seq_length, return_tensors='np')
+            inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+            if self.pooling_mode == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = features['attention_mask'][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.empty((len(texts), batches[0].shape[1]) if batches else (0, 0), dtype=np.float32)
+        if batches:
+            embeddings[order] = np.concatenate(batches)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
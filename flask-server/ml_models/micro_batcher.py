@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# How long the first request of a batch waits for others to join (0 disables batching)
+DEFAULT_WINDOW_MS = float(os.environ.get('MODEL_BATCH_WINDOW_MS', 10))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('MODEL_MAX_BATCH_SIZE', 64))
+
+
+class _Request:
+    __slots__ = ('texts', 'kwargs_key', 'kwargs', 'future', 'enqueued_at')
+
+    def __init__(self, texts, kwargs):
+        self.texts = texts
+        self.kwargs = kwargs
+        self.kwargs_key = tuple(sorted(kwargs.items()))
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, encode: Callable, window_ms: float = None, max_batch_size: int = None, name: str = 'encoder'):
+        """
+        Coalesce concurrent encode requests into batched calls.
+
+        Callers submit texts from any thread and get a Future. A single
+        background thread takes the first waiting request, keeps collecting
+        requests with the same encode options for up to ``window_ms`` or until
+        ``max_batch_size`` texts are gathered, runs one ``encode`` over all of
+        them and hands every caller its slice of the result.
+
+        Args:
+            encode (Callable): ``encode(texts, **kwargs)`` returning one row per text
+            window_ms (float): Collection window of a batch in milliseconds
+            max_batch_size (int): Maximum number of texts per batch
+            name (str): Name used for the thread and in logs
+        """
+        self.encode = encode
+        self.window = (DEFAULT_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch_size = max_batch_size or DEFAULT_MAX_BATCH_SIZE
+        self.name = name
+        self.queue = queue.Queue()
+        self._carry = []  # Requests taken from the queue that did not fit the last batch
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'requests': 0,
+            'texts': 0,
+            'max_batch_texts': 0,
+            'wait_seconds': 0.0,
+            'encode_seconds': 0.0
+        }
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, texts: List[str], **kwargs) -> Future:
+        """Queue texts for encoding; the Future resolves to their embeddings."""
+        self._ensure_thread()
+        request = _Request(list(texts), kwargs)
+        self.queue.put(request)
+        return request.future
+
+    def _ensure_thread(self):
+        # Started lazily so a forked worker gets its own thread
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def _poll(self, remaining: float):
+        """Next request: leftovers first, then the queue until the window closes."""
+        if self._carry:
+            return self._carry.pop(0)
+        try:
+            if remaining > 0:
+                return self.queue.get(timeout=remaining)
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        while True:
+            first = self._carry.pop(0) if self._carry else self.queue.get()
+            batch, size, skipped = [first], len(first.texts), []
+            deadline = first.enqueued_at + self.window
+            while size < self.max_batch_size:
+                request = self._poll(deadline - time.perf_counter())
+                if request is None:
+                    break
+                if request.kwargs_key != first.kwargs_key:
+                    # Different encode options cannot share a batch
+                    skipped.append(request)
+                    continue
+                if size + len(request.texts) > self.max_batch_size:
+                    skipped.append(request)
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._carry = skipped + self._carry
+            self._execute(batch)
+
+    def _execute(self, batch: List[_Request]):
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        try:
+            embeddings = self.encode(texts, **batch[0].kwargs)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(np.asarray(embeddings[offset:offset + len(request.texts)]))
+            offset += len(request.texts)
+
+        with self._lock:
+            metrics = self._metrics
+            metrics['batches'] += 1
+            metrics['requests'] += len(batch)
+            metrics['texts'] += len(texts)
+            metrics['max_batch_texts'] = max(metrics['max_batch_texts'], len(texts))
+            metrics['wait_seconds'] += sum(started - request.enqueued_at for request in batch)
+            metrics['encode_seconds'] += finished - started
+
+    def stats(self) -> Dict:
+        """Queue depth and batch-size metrics since start."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        batches = metrics['batches'] or 1
+        requests = metrics['requests'] or 1
+        return {
+            'queue_depth': self.queue.qsize() + len(self._carry),
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'batches': metrics['batches'],
+            'requests': metrics['requests'],
+            'texts': metrics['texts'],
+            'avg_batch_texts': round(metrics['texts'] / batches, 2),
+            'avg_batch_requests': round(metrics['requests'] / batches, 2),
+            'max_batch_texts': metrics['max_batch_texts'],
+            'avg_wait_ms': round(metrics['wait_seconds'] * 1000 / requests, 2),
+            'avg_encode_ms': round(metrics['encode_seconds'] * 1000 / batches, 2)
+        }
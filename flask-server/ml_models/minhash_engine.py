@@ -0,0 +1,101 @@
+import hashlib
+import numpy as np
+from typing import List
+
+# Constants of the datasketch 1.x MinHash permutation scheme
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Shingle rows per permutation block; bounds the (rows, num_perm) uint64 work array
+DEFAULT_CHUNK_ROWS = 1024
+
+
+def sha1_hash32_batch(values: List[str]) -> np.ndarray:
+    """
+    Hash many strings with the 32-bit SHA1 hash of datasketch 1.x ``MinHash``.
+
+    Args:
+        values (List[str]): Strings to hash
+
+    Returns:
+        np.ndarray: uint64 array of 32-bit hash values
+    """
+    # One C-level SHA1 call per shingle; this loop is the engine's main remaining cost
+    sha1 = hashlib.sha1
+    digests = b''.join([sha1(value).digest()[:4] for value in map(str.encode, values)])
+    return np.frombuffer(digests, dtype='<u4').astype(np.uint64)
+
+
+class MinHashEngine:
+    def __init__(self, num_perm: int = 128, seed: int = 1, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """
+        Vectorized MinHash over many documents at once.
+
+        Signatures are identical to those of datasketch 1.x
+        ``MinHash(num_perm, seed)`` fed the same shingles, so they can be
+        inserted into ``MinHashLSH``. datasketch 2.0 hashes differently by
+        default, which is why requirements.txt pins ``datasketch<2``.
+
+        Args:
+            num_perm (int): Number of permutations
+            seed (int): Permutation seed (datasketch default is 1)
+            chunk_rows (int): Shingles permuted per NumPy block
+        """
+        self.num_perm = num_perm
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+
+        # Same draw order as datasketch: one (a, b) pair per permutation
+        generator = np.random.RandomState(seed)
+        permutations = np.array([
+            (generator.randint(1, MERSENNE_PRIME, dtype=np.uint64),
+             generator.randint(0, MERSENNE_PRIME, dtype=np.uint64))
+            for _ in range(num_perm)
+        ], dtype=np.uint64).T
+        self.a = permutations[0]
+        self.b = permutations[1]
+
+    def empty_signature(self) -> np.ndarray:
+        return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+
+    def signatures(self, shingle_lists: List[List[str]]) -> np.ndarray:
+        """
+        Compute the MinHash signatures of many documents.
+
+        Args:
+            shingle_lists (List[List[str]]): Shingles of each document
+
+        Returns:
+            np.ndarray: (documents, num_perm) uint64 array of hash values
+        """
+        # Duplicate shingles cannot change a minimum, so hash each distinct one once
+        shingle_sets = [list(set(shingles)) for shingles in shingle_lists]
+        counts = np.array([len(shingles) for shingles in shingle_sets], dtype=np.int64)
+        result = np.full((len(shingle_sets), self.num_perm), MAX_HASH, dtype=np.uint64)
+        if counts.sum() == 0:
+            return result
+
+        hashes = sha1_hash32_batch([shingle for shingles in shingle_sets for shingle in shingles])
+        row_docs = np.repeat(np.arange(len(shingle_sets)), counts)
+
+        buffer = np.empty((min(self.chunk_rows, len(hashes)), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(hashes), self.chunk_rows):
+            stop = start + self.chunk_rows
+            block = hashes[start:stop]
+            permuted = buffer[:len(block)]
+            # In place, uint64 wraparound matches datasketch's per-shingle update
+            np.multiply(block[:, None], self.a, out=permuted)
+            permuted += self.b
+            np.remainder(permuted, MERSENNE_PRIME, out=permuted)
+            permuted &= MAX_HASH
+            docs = row_docs[start:stop]
+            boundaries = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+            block_min = np.minimum.reduceat(permuted, boundaries, axis=0)
+            block_docs = docs[boundaries]
+            # A document split across two blocks keeps the smaller of both minima
+            result[block_docs] = np.minimum(result[block_docs], block_min)
+        return result
+
+    def signature(self, shingles: List[str]) -> np.ndarray:
+        """Compute the MinHash signature of a single document."""
+        return self.signatures([shingles])[0]
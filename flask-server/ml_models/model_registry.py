@@ -0,0 +1,178 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List
+from ml_models.micro_batcher import MicroBatcher, DEFAULT_WINDOW_MS, DEFAULT_MAX_BATCH_SIZE
+from ml_models.inference_backends import DEFAULT_BACKEND, load_encoder
+
+DEFAULT_MODEL = 'paraphrase-MiniLM-L6-v2'
+
+
+def _current_rss_bytes() -> int:
+    """Return the resident set size of this process in bytes (0 if unknown)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        try:
+            import resource
+            # ru_maxrss is reported in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return 0
+
+
+def model_key(model_name: str, backend: str = DEFAULT_BACKEND) -> str:
+    """Registry key of a model loaded with a given inference backend."""
+    return model_name if backend == 'torch' else f"{model_name}[{backend}]"
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models.
+
+    Each model is loaded at most once per worker process and shared by every
+    thread in it. Inference goes through a per-model lock so concurrent
+    processing threads never run ``encode`` on the same model at the same time.
+    Unless ``batch_window_ms`` is 0, concurrent ``encode`` calls are coalesced
+    by a per-model MicroBatcher into one batched forward pass. The inference
+    backend (see ``inference_backends.py``) defaults to ``SIMILARITY_BACKEND``;
+    each (model, backend) pair is loaded separately.
+    """
+
+    def __init__(self, batch_window_ms: float = None, max_batch_size: int = None):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._inference_locks = {}
+        self._batchers = {}
+        self._stats = {}
+        self.batch_window_ms = DEFAULT_WINDOW_MS if batch_window_ms is None else batch_window_ms
+        self.max_batch_size = max_batch_size or DEFAULT_MAX_BATCH_SIZE
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, model_name: str = DEFAULT_MODEL, backend: str = None):
+        """
+        Return the shared encoder for ``model_name``, loading it on first use.
+
+        Args:
+            model_name (str): Name of the pre-trained model
+            backend (str): Inference backend, ``SIMILARITY_BACKEND`` by default
+
+        Returns:
+            SentenceTransformer: The shared model instance (an ``OnnxEncoder``
+            for the ONNX backends)
+        """
+        backend = backend or DEFAULT_BACKEND
+        key = model_key(model_name, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(model_name, backend)
+                self._models[key] = model
+                self._inference_locks[key] = threading.Lock()
+                if self.batch_window_ms > 0:
+                    self._batchers[key] = MicroBatcher(
+                        lambda texts, _key=key, **kwargs: self._encode_locked(_key, texts, **kwargs),
+                        window_ms=self.batch_window_ms,
+                        max_batch_size=self.max_batch_size,
+                        name=key
+                    )
+        return model
+
+    def _load(self, model_name: str, backend: str):
+        key = model_key(model_name, backend)
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+
+        model = load_encoder(model_name, backend)
+        device = str(model.device)
+
+        load_seconds = time.perf_counter() - started
+        rss_after = _current_rss_bytes()
+        self._stats[key] = {
+            'backend': backend,
+            'device': device,
+            'pid': os.getpid(),
+            'load_seconds': round(load_seconds, 3),
+            'rss_delta_mb': round(max(0, rss_after - rss_before) / (1024 * 1024), 1),
+            'loaded_at': time.time()
+        }
+        self.logger.info(
+            f"Loaded model {model_name} ({backend}) on {device} in {load_seconds:.2f}s "
+            f"(pid {os.getpid()}, +{self._stats[key]['rss_delta_mb']} MB)"
+        )
+        return model
+
+    @staticmethod
+    def model_version(model_name: str = DEFAULT_MODEL, backend: str = None) -> str:
+        """
+        Identify a model together with the library version and backend that run it.
+
+        Read from package metadata, so it does not import torch or load the model.
+        Stored embeddings tagged with another version are recomputed.
+        """
+        backend = backend or DEFAULT_BACKEND
+        try:
+            from importlib.metadata import version
+            library_version = version('sentence-transformers')
+        except Exception:
+            library_version = 'unknown'
+        suffix = '' if backend == 'torch' else f"+{backend}"
+        return f"{model_name}@sentence-transformers-{library_version}{suffix}"
+
+    def inference_lock(self, model_name: str = DEFAULT_MODEL, backend: str = None) -> threading.Lock:
+        """Return the lock guarding inference on ``model_name``."""
+        backend = backend or DEFAULT_BACKEND
+        self.get(model_name, backend)
+        return self._inference_locks[model_key(model_name, backend)]
+
+    def _encode_locked(self, key: str, texts, **kwargs):
+        with self._inference_locks[key]:
+            return self._models[key].encode(texts, **kwargs)
+
+    def encode(self, texts, model_name: str = DEFAULT_MODEL, backend: str = None, **kwargs):
+        """
+        Thread-safe ``model.encode`` on the shared instance of ``model_name``.
+
+        Lists of texts encoded to NumPy go through the model's micro-batcher, so
+        requests arriving within the batch window share one forward pass; a
+        single string or tensor output is encoded directly.
+        """
+        backend = backend or DEFAULT_BACKEND
+        key = model_key(model_name, backend)
+        self.get(model_name, backend)
+        batcher = self._batchers.get(key)
+        if batcher is None or isinstance(texts, str) or kwargs.get('convert_to_tensor') \
+                or not kwargs.get('convert_to_numpy', True):
+            return self._encode_locked(key, texts, **kwargs)
+        return batcher.submit(texts, **kwargs).result()
+
+    def warmup(self, model_names: List[str] = None):
+        """
+        Load the given models and run one dummy encode so the first real request
+        does not pay for lazy initialisation.
+        """
+        for model_name in model_names or [DEFAULT_MODEL]:
+            try:
+                self.encode(['warmup'], model_name=model_name)
+            except Exception as e:
+                self.logger.error(f"Model warmup failed for {model_name}: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Return load statistics for every model loaded in this process."""
+        return {
+            'pid': os.getpid(),
+            'rss_mb': round(_current_rss_bytes() / (1024 * 1024), 1),
+            'models': {name: dict(stats) for name, stats in self._stats.items()},
+            'batching': {name: batcher.stats() for name, batcher in self._batchers.items()}
+        }
+
+
+# Create a global instance
+model_registry = ModelRegistry()
@@ -1,49 +1,547 @@
 import os
 import io
+import re
+import math
+import time
+import hashlib
 import datetime
 import logging
-from pdf2image import convert_from_path
+import tempfile
+import threading
+import contextlib
+import collections
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PyPDF2 import PdfReader
 import pytesseract
 
+DEFAULT_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', os.cpu_count() or 1))
+# Pages whose embedded text layer has fewer non-whitespace characters than
+# this are treated as scanned and sent to Tesseract
+DEFAULT_MIN_TEXT_CHARS = int(os.environ.get('OCR_MIN_TEXT_CHARS', 50))
+# Pages are rendered in grayscale a few at a time, so peak memory depends on
+# the window size rather than on the document length
+DEFAULT_DPI = int(os.environ.get('OCR_DPI', 200))
+DEFAULT_PAGE_WINDOW = int(os.environ.get('OCR_PAGE_WINDOW', 4))
+DEFAULT_MAX_PAGES = int(os.environ.get('OCR_MAX_PAGES', 100))
+DEFAULT_MAX_WINDOW_MB = int(os.environ.get('OCR_MAX_WINDOW_MB', 256))
+DEFAULT_ALLOW_PARTIAL = os.environ.get('OCR_ALLOW_PARTIAL', '0') == '1'
+
+# PDFs given as bytes or streams are spooled into an anonymous memory file
+# (memfd); where that is unavailable, into a temporary file in this directory.
+# /dev/shm keeps the fallback off the container's overlay filesystem.
+DEFAULT_SPOOL_DIR = os.environ.get('OCR_SPOOL_DIR') or ('/dev/shm' if os.path.isdir('/dev/shm') else None)
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# pdfinfo -f/-l prints one "Page    N size: W x H pts" line per page
+PAGE_SIZE_KEY = re.compile(r'^Page\s+(\d+)\s+size$')
+PAGE_SIZE_VALUE = re.compile(r'^([\d.]+)\s*x\s*([\d.]+)\s*pts')
+
+# Bump when extraction logic changes in a way that alters the output text
+EXTRACTION_VERSION = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+_tesseract_version = None
+
+
+def _init_pool_process():
+    """
+    Limit the tesseract processes started from this pool process to one thread.
+
+    Tesseract starts its own OpenMP threads for every call. With several pages
+    running in parallel that oversubscribes the cores, so parallelism comes from
+    the pool instead. Set here rather than at import, so the limit never
+    reaches the parent process and its torch inference.
+    """
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+def _get_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide OCR pool, shared by every OCRProcessor."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the parent may hold model and server threads that must not be forked
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_pool_process
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def _ocr_page(page_number: int, image, config: str) -> Dict:
+    """OCR one page image in a pool process."""
+    started = time.perf_counter()
+    try:
+        text = pytesseract.image_to_string(image, config=config)
+        error = None
+    except Exception as e:
+        text = ''
+        error = str(e)
+    return {
+        'page': page_number,
+        'text': text,
+        'method': 'ocr',
+        'seconds': round(time.perf_counter() - started, 3),
+        'error': error
+    }
+
+
+def _failed_page(page_number: int, method: str, error: str) -> Dict:
+    return {
+        'page': page_number,
+        'text': '',
+        'method': method,
+        'seconds': 0.0,
+        'error': error
+    }
+
+
+class SpooledPDF:
+    """A PDF given as bytes or a stream, readable by poppler and PyPDF2 under ``path``."""
+
+    def __init__(self, path: str, sha256: str, size: int, in_memory: bool):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.in_memory = in_memory
+
+
+def _memfd_path(fd: int) -> str:
+    # /proc/<pid> rather than /proc/self, so poppler child processes open our descriptor
+    return f"/proc/{os.getpid()}/fd/{fd}"
+
+
+@contextlib.contextmanager
+def spool_pdf(source, spool_dir: str = None) -> Iterator[SpooledPDF]:
+    """
+    Make PDF bytes or a binary stream available under a file path.
+
+    On Linux the data is copied into a memfd that poppler and PyPDF2 open
+    through ``/proc/<pid>/fd/<n>``, so nothing is written to disk; otherwise
+    it goes to a temporary file in ``spool_dir``. Streams are copied in chunks
+    and hashed on the way. The memfd or file is released when the block exits,
+    including when extraction fails.
+
+    Args:
+        source (bytes | file): PDF data or a readable binary stream
+        spool_dir (str): Directory for the temporary-file fallback
+
+    Yields:
+        SpooledPDF: Path, SHA-256 and size of the PDF
+    """
+    fd, temp_path = None, None
+    try:
+        if hasattr(os, 'memfd_create'):
+            try:
+                fd = os.memfd_create('autoassign-pdf', os.MFD_CLOEXEC)
+                if not os.path.exists(_memfd_path(fd)):
+                    os.close(fd)
+                    fd = None
+            except OSError:
+                fd = None
+        in_memory = fd is not None
+        if fd is None:
+            fd, temp_path = tempfile.mkstemp(suffix='.pdf', dir=spool_dir or DEFAULT_SPOOL_DIR)
+
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb', closefd=False) as spool:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                digest.update(source)
+                spool.write(source)
+                size = len(source)
+            else:
+                while True:
+                    chunk = source.read(SPOOL_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+
+        yield SpooledPDF(_memfd_path(fd) if in_memory else temp_path, digest.hexdigest(), size, in_memory)
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if temp_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+
+
+class OCRBudgetExceeded(Exception):
+    """Raised when a document exceeds the page or memory budget outside partial mode."""
+
+
 class OCRProcessor:
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_workers: int = None, tesseract_config: str = '',
+                 min_text_chars: int = None, dpi: int = None, page_window: int = None,
+                 max_pages: int = None, max_window_mb: int = None, allow_partial: bool = None,
+                 spool_dir: str = None, **kwargs):
+        """
+        Initialize the OCR processor.
+
+        Args:
+            max_workers (int): Size of the page OCR process pool (``OCR_MAX_WORKERS``)
+            tesseract_config (str): Extra command line options passed to Tesseract
+            min_text_chars (int): Minimum text-layer characters for a page to skip OCR
+                (``OCR_MIN_TEXT_CHARS``)
+            dpi (int): Rasterization resolution (``OCR_DPI``)
+            page_window (int): Maximum pages rendered at once (``OCR_PAGE_WINDOW``)
+            max_pages (int): Maximum pages processed per document (``OCR_MAX_PAGES``)
+            max_window_mb (int): Memory budget for rendered page images in flight
+                (``OCR_MAX_WINDOW_MB``)
+            allow_partial (bool): Return what could be processed instead of raising
+                when a budget is exceeded (``OCR_ALLOW_PARTIAL``)
+            spool_dir (str): Directory for spooling PDFs when memfd is unavailable
+                (``OCR_SPOOL_DIR``)
+        """
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.tesseract_config = tesseract_config
+        self.min_text_chars = DEFAULT_MIN_TEXT_CHARS if min_text_chars is None else min_text_chars
+        self.dpi = dpi or DEFAULT_DPI
+        self.page_window = page_window or DEFAULT_PAGE_WINDOW
+        self.max_pages = max_pages or DEFAULT_MAX_PAGES
+        self.max_window_bytes = (max_window_mb or DEFAULT_MAX_WINDOW_MB) * 1024 * 1024
+        self.allow_partial = DEFAULT_ALLOW_PARTIAL if allow_partial is None else allow_partial
+        self.spool_dir = spool_dir or DEFAULT_SPOOL_DIR
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
 
-    def extract_text_from_pdf(self, pdf_path):
+    def engine_version(self) -> str:
+        """
+        Identify the OCR engine and settings that produce this processor's output,
+        so cached results from a different engine or configuration are not reused.
+        """
+        global _tesseract_version
+        if _tesseract_version is None:
+            try:
+                _tesseract_version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                _tesseract_version = 'unknown'
+        return (
+            f"v{EXTRACTION_VERSION};tesseract={_tesseract_version};"
+            f"config={self.tesseract_config};min_text_chars={self.min_text_chars};dpi={self.dpi};"
+            # Budgets decide which pages are skipped or failed, so they are part of the version
+            f"max_pages={self.max_pages};max_window_bytes={self.max_window_bytes};"
+            f"allow_partial={int(self.allow_partial)}"
+        )
+
+    def _read_text_layer(self, pdf_path) -> Optional[List[Dict]]:
+        """
+        Extract the embedded text layer of every page.
+
+        Returns:
+            List[Dict]: One result per page with method 'text_layer', or None if
+            the PDF's text layer cannot be read at all
+        """
+        try:
+            reader = PdfReader(pdf_path)
+            pages = []
+            for page_number, page in enumerate(reader.pages, start=1):
+                started = time.perf_counter()
+                try:
+                    text = page.extract_text() or ''
+                except Exception:
+                    text = ''
+                pages.append({
+                    'page': page_number,
+                    'text': text,
+                    'method': 'text_layer',
+                    'seconds': round(time.perf_counter() - started, 3),
+                    'error': None
+                })
+            return pages
+        except Exception as e:
+            self.logger.warning(f"Could not read PDF text layer, falling back to OCR: {str(e)}")
+            return None
+
+    def _has_usable_text(self, text: str) -> bool:
+        return len(''.join(text.split())) >= self.min_text_chars
+
+    def _page_count(self, pdf_path) -> int:
+        return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+    def _estimate_page_bytes(self, pdf_path, last_page: int) -> Dict[int, int]:
+        """
+        Grayscale image size of each page at ``self.dpi``, from pdfinfo's page
+        dimensions, so oversized pages are caught before they are rendered.
+
+        Returns:
+            Dict[int, int]: Page number -> estimated bytes; empty if pdfinfo
+            reports no page sizes, in which case only rendered pages are checked
+        """
+        try:
+            info = pdfinfo_from_path(pdf_path, first_page=1, last_page=last_page)
+        except Exception as e:
+            self.logger.warning(f"Could not read page sizes, checking pages after rendering: {str(e)}")
+            return {}
+        estimates = {}
+        for key, value in info.items():
+            key_match, value_match = PAGE_SIZE_KEY.match(key), PAGE_SIZE_VALUE.match(str(value))
+            if key_match and value_match:
+                width, height = (math.ceil(float(points) * self.dpi / 72) for points in value_match.groups())
+                estimates[int(key_match.group(1))] = width * height
+        return estimates
+
+    def _budget_message(self, page_number: int, image_bytes: int) -> str:
+        return (f"Page {page_number} needs {image_bytes // (1024 * 1024)} MB at "
+                f"{self.dpi} dpi, over the {self.max_window_bytes // (1024 * 1024)} MB budget")
+
+    def _render_window(self, pdf_path, page_numbers: List[int], allow_partial: bool):
+        """
+        Render a contiguous window of pages in grayscale.
+
+        Pages are normally checked against the memory budget before rendering
+        (see ``_estimate_page_bytes``); the check here catches pages whose size
+        could not be estimated.
+
+        Returns:
+            Tuple[List, int]: One PIL image (or failed-page result) per page number,
+            and the largest rendered page size in bytes
+        """
+        try:
+            images = convert_from_path(
+                pdf_path,
+                dpi=self.dpi,
+                grayscale=True,
+                first_page=page_numbers[0],
+                last_page=page_numbers[-1]
+            )
+        except Exception as e:
+            if not allow_partial:
+                raise
+            return [_failed_page(n, 'ocr', f"Rasterization failed: {str(e)}") for n in page_numbers], 0
+
+        rendered = []
+        largest = 0
+        for page_number, image in zip(page_numbers, images):
+            image_bytes = image.width * image.height * len(image.getbands())
+            if image_bytes > self.max_window_bytes:
+                message = self._budget_message(page_number, image_bytes)
+                if not allow_partial:
+                    raise OCRBudgetExceeded(message)
+                rendered.append(_failed_page(page_number, 'ocr', message))
+                continue
+            largest = max(largest, image_bytes)
+            rendered.append(image)
+        return rendered, largest
+
+    def spool(self, source):
+        """Context manager exposing PDF bytes or a stream under a path, see ``spool_pdf``."""
+        return spool_pdf(source, self.spool_dir)
+
+    def iter_pages(self, pdf, allow_partial: bool = None) -> Iterator[Dict]:
+        """
+        Stream page results in page order while the document is being processed.
+
+        Text-layer pages are yielded as soon as they are reached. Pages that need
+        OCR are rendered in small grayscale windows (``first_page``/``last_page``)
+        and OCR'd on the shared pool; at most two windows of images are in flight,
+        and the window shrinks to fit the memory budget, so peak memory does not
+        grow with the document length. Page sizes are estimated from pdfinfo
+        before rendering, so a page over the budget is never rendered and large
+        pages are rendered in smaller windows, down to one page at a time.
+        Args:
+            pdf (str | bytes | file): Path to the PDF file, its bytes or a binary stream
+            allow_partial (bool): Report budget violations as failed pages instead of raising
+        Yields:
+            Dict: Page result with 'page', 'text', 'method', 'seconds' and 'error'
+        """
+        if isinstance(pdf, (str, os.PathLike)):
+            yield from self._iter_pages(pdf, allow_partial)
+            return
+        with self.spool(pdf) as spooled:
+            yield from self._iter_pages(spooled.path, allow_partial)
+
+    def _iter_pages(self, pdf_path, allow_partial: bool = None) -> Iterator[Dict]:
+        allow_partial = self.allow_partial if allow_partial is None else allow_partial
+        pages = self._read_text_layer(pdf_path)
+        if pages is None:
+            pages = [None] * self._page_count(pdf_path)
+
+        skipped = []
+        if len(pages) > self.max_pages:
+            message = f"Document has {len(pages)} pages, over the {self.max_pages} page budget"
+            if not allow_partial:
+                raise OCRBudgetExceeded(message)
+            self.logger.warning(f"{message}; processing the first {self.max_pages}")
+            skipped = [_failed_page(n, 'skipped', message) for n in range(self.max_pages + 1, len(pages) + 1)]
+            pages = pages[:self.max_pages]
+
+        pool = _get_pool(self.max_workers)
+        pending = collections.deque()  # Page results or OCR futures, in page order
+        window = []
+        window_limit = self.page_window
+        estimates = {}
+        if any(page is None or not self._has_usable_text(page['text']) for page in pages):
+            estimates = self._estimate_page_bytes(pdf_path, len(pages))
+
+        def limit_for(page_numbers):
+            """Window size that keeps two windows of the largest estimated page within the budget."""
+            largest = max(estimates.get(n, 0) for n in page_numbers)
+            if not largest:
+                return window_limit
+            return min(window_limit, max(1, self.max_window_bytes // (2 * largest)))
+
+        def submit_window():
+            nonlocal window_limit
+            rendered, largest = self._render_window(pdf_path, window, allow_partial)
+            if largest:
+                # Keep two windows of pages this size within the budget
+                window_limit = max(1, min(self.page_window, self.max_window_bytes // (2 * largest)))
+            for page_number, item in zip(window, rendered):
+                if isinstance(item, dict):
+                    pending.append(item)
+                else:
+                    pending.append(pool.submit(_ocr_page, page_number, item, self.tesseract_config))
+            window.clear()
+
+        def ready(item):
+            return not isinstance(item, Future) or item.done()
+
+        def in_flight():
+            return sum(1 for item in pending if isinstance(item, Future) and not item.done())
+
+        try:
+            for page_number, page in enumerate(pages, start=1):
+                if page is not None and self._has_usable_text(page['text']):
+                    if window:
+                        submit_window()
+                    pending.append(page)
+                elif estimates.get(page_number, 0) > self.max_window_bytes:
+                    # Too large to render at all: fail it without rendering
+                    message = self._budget_message(page_number, estimates[page_number])
+                    if not allow_partial:
+                        raise OCRBudgetExceeded(message)
+                    if window:
+                        submit_window()
+                    pending.append(_failed_page(page_number, 'ocr', message))
+                else:
+                    # A large page first flushes the window, so it is never rendered with too many others
+                    if window and len(window) >= limit_for(window + [page_number]):
+                        submit_window()
+                    window.append(page_number)
+                    if len(window) >= limit_for(window):
+                        submit_window()
+
+                # Hand back finished pages; block once two windows are in flight
+                while pending and (ready(pending[0]) or in_flight() >= 2 * window_limit):
+                    item = pending.popleft()
+                    yield item.result() if isinstance(item, Future) else item
+
+            if window:
+                submit_window()
+            while pending:
+                item = pending.popleft()
+                yield item.result() if isinstance(item, Future) else item
+        except BrokenProcessPool:
+            _reset_pool()
+            raise
+        finally:
+            for item in pending:
+                if isinstance(item, Future):
+                    item.cancel()
+
+        for page in skipped:
+            yield page
+
+    def extract_pages(self, pdf, allow_partial: bool = None) -> List[Dict]:
+        """
+        Extract every page of a PDF, using the embedded text layer where it has
+        enough text and page-parallel OCR for image-only or low-text pages.
+        Args:
+            pdf (str | bytes | file): Path to the PDF file, its bytes or a binary stream
+            allow_partial (bool): Report budget violations as failed pages instead of raising
+        Returns:
+            List[Dict]: One result per page, in page order, with 'page', 'text',
+            'method' ('text_layer', 'ocr' or 'skipped'), 'seconds' and 'error' (None on success)
+        """
+        return list(self.iter_pages(pdf, allow_partial=allow_partial))
+
+    def extract_text_from_pdf(self, pdf):
         """
-        Extract text from a PDF file using Tesseract OCR.
+        Extract text from a PDF file using its text layer and Tesseract OCR.
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf (str | bytes | file): Path to the PDF file, its bytes or a binary stream
         Returns:
             str: Extracted text
         """
         try:
-            # Convert PDF to images (one per page)
-            images = convert_from_path(pdf_path)
-            text = ''
-            for i, image in enumerate(images):
-                page_text = pytesseract.image_to_string(image)
-                text += page_text + '\n'
-            return text.strip()
+            return self.join_pages(self.extract_pages(pdf))
         except Exception as e:
             self.logger.error(f"Error processing PDF with Tesseract: {str(e)}")
             raise
 
-    def process_submission(self, pdf_path):
+    def join_pages(self, pages: List[Dict]) -> str:
+        """
+        Concatenate page texts in order.
+
+        Raises:
+            RuntimeError: If no page could be processed
+        """
+        failed = [page for page in pages if page['error']]
+        if pages and len(failed) == len(pages):
+            raise RuntimeError(f"OCR failed on every page: {failed[0]['error']}")
+        for page in failed:
+            self.logger.warning(f"OCR failed on page {page['page']}: {page['error']}")
+        return '\n'.join(page['text'] for page in pages).strip()
+
+    @staticmethod
+    def page_stats(pages: List[Dict]) -> List[Dict]:
+        """Per-page timings and failures, without the text."""
+        return [
+            {
+                'page': page['page'],
+                'method': page['method'],
+                'seconds': page['seconds'],
+                'chars': len(page['text']),
+                'error': page['error']
+            }
+            for page in pages
+        ]
+
+    @staticmethod
+    def method_counts(pages: List[Dict]) -> Dict[str, int]:
+        """Number of pages that took each extraction path."""
+        counts = {'text_layer': 0, 'ocr': 0, 'skipped': 0}
+        for page in pages:
+            counts[page['method']] = counts.get(page['method'], 0) + 1
+        return counts
+
+    def process_submission(self, pdf):
         """
         Process a student's PDF submission using Tesseract OCR.
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf (str | bytes | file): Path to the PDF file, its bytes or a binary stream
         Returns:
             dict: Processed submission data including extracted text and metadata
         """
         try:
-            extracted_text = self.extract_text_from_pdf(pdf_path)
+            started = time.perf_counter()
+            pages = self.extract_pages(pdf)
+            extracted_text = self.join_pages(pages)
             return {
                 'text': extracted_text,
                 'word_count': len(extracted_text.split()),
                 'processed_timestamp': datetime.datetime.now().isoformat(),
+                'pages': self.page_stats(pages),
+                'methods': self.method_counts(pages),
+                'seconds': round(time.perf_counter() - started, 3),
+                'partial': any(page['error'] for page in pages),
                 'success': True
             }
         except Exception as e:
@@ -52,4 +550,4 @@ class OCRProcessor:
                 'text': '',
                 'error': str(e),
                 'success': False
-            } 
\ No newline at end of file
+            }
@@ -1,20 +1,46 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
+import os
 import numpy as np
 from typing import List, Dict, Tuple
 import logging
+from ml_models.model_registry import model_registry, DEFAULT_MODEL
+from ml_models.inference_backends import DEFAULT_BACKEND
+
+# Long answers are encoded as overlapping word windows; MiniLM truncates
+# anything past 128 tokens (~90 words)
+DEFAULT_CHUNK_WORDS = int(os.environ.get('SIMILARITY_CHUNK_WORDS', 80))
+DEFAULT_CHUNK_OVERLAP = int(os.environ.get('SIMILARITY_CHUNK_OVERLAP', 20))
+# 'mean': cosine of the mean-pooled chunk embeddings
+# 'alignment': F1 of best-matching chunks in both directions
+DEFAULT_POOLING = os.environ.get('SIMILARITY_POOLING', 'mean')
 
 class SimilarityChecker:
-    def __init__(self, model_name: str = 'paraphrase-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = DEFAULT_MODEL, chunk_words: int = None,
+                 chunk_overlap: int = None, pooling: str = None, backend: str = None):
         """
         Initialize the similarity checker with a Sentence-BERT model.
+
+        The model itself is shared through ``model_registry``, so creating a
+        checker does not reload it from disk.
         
         Args:
             model_name (str): Name of the pre-trained model to use
+            chunk_words (int): Words per encoded window
+            chunk_overlap (int): Words shared by consecutive windows
+            pooling (str): 'mean' or 'alignment', see ``pooled_similarity``
+            backend (str): Inference backend ('torch', 'int8', 'onnx' or
+                'onnx-int8'), ``SIMILARITY_BACKEND`` by default
         """
-        self.model = SentenceTransformer(model_name)
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model.to(self.device)
+        self.model_name = model_name
+        self.chunk_words = chunk_words or DEFAULT_CHUNK_WORDS
+        self.chunk_overlap = DEFAULT_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.pooling = pooling or DEFAULT_POOLING
+        if not 0 <= self.chunk_overlap < self.chunk_words:
+            raise ValueError("chunk_overlap must be smaller than chunk_words")
+        if self.pooling not in ('mean', 'alignment'):
+            raise ValueError(f"Unknown pooling '{self.pooling}'")
+        self.backend = backend or DEFAULT_BACKEND
+        self.model = model_registry.get(model_name, self.backend)
+        self.device = str(self.model.device)
         
         # Configure logging
         logging.basicConfig(level=logging.INFO)
@@ -38,45 +64,109 @@ class SimilarityChecker:
             float: Similarity score between 0 and 1
         """
         try:
-            # Encode texts to get embeddings
-            embedding1 = self.model.encode(text1, convert_to_tensor=True)
-            embedding2 = self.model.encode(text2, convert_to_tensor=True)
-            
-            # Compute cosine similarity
-            similarity = util.pytorch_cos_sim(embedding1, embedding2)
-            
-            return float(similarity[0][0])
+            # Encode all windows of both texts in one batch
+            chunks1, chunks2 = self.embed_chunks([text1, text2])
+            return self.pooled_similarity(chunks1, chunks2)
         except Exception as e:
             self.logger.error(f"Error computing similarity: {str(e)}")
             raise
 
-    def check_answer_correctness(self, student_answer: str, correct_answer: str) -> Dict:
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into L2-normalized float32 embeddings.
+        
+        Args:
+            texts (List[str]): Texts to encode
+            
+        Returns:
+            np.ndarray: (texts, dim) array whose dot products are cosine similarities
+        """
+        embeddings = model_registry.encode(list(texts), model_name=self.model_name, backend=self.backend,
+                                           convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Split a text into overlapping windows of ``chunk_words`` words."""
+        words = (text or "").split()
+        if len(words) <= self.chunk_words:
+            return [' '.join(words)]
+        step = self.chunk_words - self.chunk_overlap
+        starts = range(0, len(words) - self.chunk_overlap, step)
+        return [' '.join(words[start:start + self.chunk_words]) for start in starts]
+
+    def embed_chunks(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Encode every window of every text in one batched call.
+        
+        Args:
+            texts (List[str]): Texts to encode
+            
+        Returns:
+            List[np.ndarray]: Per text, a (windows, dim) array of normalized embeddings
+        """
+        chunks = [self.chunk_text(text) for text in texts]
+        embeddings = self.embed([chunk for text_chunks in chunks for chunk in text_chunks])
+        bounds = np.cumsum([0] + [len(text_chunks) for text_chunks in chunks])
+        return [embeddings[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def pool(chunk_embeddings: np.ndarray) -> np.ndarray:
+        """Normalized mean of a text's window embeddings."""
+        pooled = np.asarray(chunk_embeddings, dtype=np.float32).mean(axis=0)
+        norm = np.linalg.norm(pooled)
+        return pooled / norm if norm else pooled
+
+    def pooled_similarity(self, chunks1: np.ndarray, chunks2: np.ndarray, pooling: str = None) -> float:
+        """
+        Similarity of two texts from their window embeddings.
+        
+        Args:
+            chunks1 (np.ndarray): Normalized window embeddings of the first text
+            chunks2 (np.ndarray): Normalized window embeddings of the second text
+            pooling (str): 'mean' compares the mean-pooled embeddings;
+                'alignment' matches every window to its best counterpart in the
+                other text and returns the F1 of both directions
+            
+        Returns:
+            float: Similarity score
+        """
+        pooling = pooling or self.pooling
+        if pooling == 'mean':
+            return float(np.clip(np.dot(self.pool(chunks1), self.pool(chunks2)), -1.0, 1.0))
+        similarities = np.asarray(chunks1) @ np.asarray(chunks2).T
+        precision = float(similarities.max(axis=1).mean())
+        recall = float(similarities.max(axis=0).mean())
+        if precision + recall <= 0:
+            return 0.0
+        return min(1.0, 2 * precision * recall / (precision + recall))
+
+    def check_answer_correctness(self, student_answer: str = None, correct_answer: str = None,
+                                 student_chunks: np.ndarray = None, correct_chunks: np.ndarray = None) -> Dict:
         """
         Check how correct a student's answer is compared to the professor's answer.
         
+        Either side may be given as precomputed window embeddings (see
+        ``embed_chunks``) instead of text; texts are encoded in one batch.
+        
         Args:
             student_answer (str): Student's submitted answer
             correct_answer (str): Professor's correct answer
+            student_chunks (np.ndarray): Window embeddings of the student's answer
+            correct_chunks (np.ndarray): Window embeddings of the correct answer
             
         Returns:
             dict: Assessment results including similarity score and correctness label
         """
         try:
-            similarity_score = self.compute_similarity(student_answer, correct_answer)
-            
-            # Determine correctness based on thresholds
-            if similarity_score >= self.thresholds['correct']:
-                correctness = 'Correct'
-            elif similarity_score >= self.thresholds['partially_correct']:
-                correctness = 'Partially Correct'
-            else:
-                correctness = 'Incorrect'
-            
-            return {
-                'similarity_score': similarity_score,
-                'correctness': correctness,
-                'confidence': self._calculate_confidence(similarity_score)
-            }
+            missing = [text for text, chunks in ((student_answer, student_chunks), (correct_answer, correct_chunks))
+                       if chunks is None]
+            encoded = iter(self.embed_chunks(missing)) if missing else iter(())
+            if student_chunks is None:
+                student_chunks = next(encoded)
+            if correct_chunks is None:
+                correct_chunks = next(encoded)
+            similarity_score = self.pooled_similarity(student_chunks, correct_chunks)
+            return self._assess(similarity_score)
         except Exception as e:
             self.logger.error(f"Error checking answer correctness: {str(e)}")
             return {
@@ -98,34 +188,34 @@ class SimilarityChecker:
             List[Dict]: List of assessment results for each answer pair
         """
         try:
-            # Encode all texts in batch
-            student_embeddings = self.model.encode(student_answers, convert_to_tensor=True)
-            correct_embeddings = self.model.encode(correct_answers, convert_to_tensor=True)
-            
-            # Compute similarities
-            similarities = util.pytorch_cos_sim(student_embeddings, correct_embeddings)
+            # Encode all windows of all texts in one batch
+            chunks = self.embed_chunks(list(student_answers) + list(correct_answers))
+            student_chunks = chunks[:len(student_answers)]
+            correct_chunks = chunks[len(student_answers):]
             
-            results = []
-            for i, similarity in enumerate(similarities.diagonal()):
-                score = float(similarity)
-                if score >= self.thresholds['correct']:
-                    correctness = 'Correct'
-                elif score >= self.thresholds['partially_correct']:
-                    correctness = 'Partially Correct'
-                else:
-                    correctness = 'Incorrect'
-                
-                results.append({
-                    'similarity_score': score,
-                    'correctness': correctness,
-                    'confidence': self._calculate_confidence(score)
-                })
-            
-            return results
+            return [
+                self._assess(self.pooled_similarity(student, correct))
+                for student, correct in zip(student_chunks, correct_chunks)
+            ]
         except Exception as e:
             self.logger.error(f"Error in batch checking answers: {str(e)}")
             return [{'error': str(e)}] * len(student_answers)
 
+    def _assess(self, similarity_score: float) -> Dict:
+        """Correctness label and confidence for a similarity score."""
+        if similarity_score >= self.thresholds['correct']:
+            correctness = 'Correct'
+        elif similarity_score >= self.thresholds['partially_correct']:
+            correctness = 'Partially Correct'
+        else:
+            correctness = 'Incorrect'
+        
+        return {
+            'similarity_score': similarity_score,
+            'correctness': correctness,
+            'confidence': self._calculate_confidence(similarity_score)
+        }
+
     def _calculate_confidence(self, similarity_score: float) -> float:
         """
         Calculate confidence level based on similarity score.
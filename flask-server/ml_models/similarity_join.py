@@ -0,0 +1,75 @@
+import numpy as np
+import scipy.sparse as sp
+from typing import Tuple
+
+# Rows multiplied against the whole corpus at a time. The partial product holds
+# at most block_size x n similarities, so memory grows linearly with n.
+DEFAULT_BLOCK_SIZE = 256
+
+
+def thresholded_similarity_join(matrix: sp.csr_matrix,
+                                threshold: float,
+                                top_k: int = None,
+                                block_size: int = DEFAULT_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all pairs of rows whose cosine similarity reaches ``threshold``.
+
+    Rows are processed in blocks against the whole corpus with sparse products,
+    and only the pairs that survive the threshold are kept, so the dense n x n
+    similarity matrix is never built.
+
+    Args:
+        matrix (csr_matrix): L2-normalized document rows (e.g. TF-IDF)
+        threshold (float): Minimum cosine similarity of a reported pair
+        top_k (int): If set, only each document's ``top_k`` most similar partners
+            are reported (a pair is kept when either document ranks the other)
+        block_size (int): Rows per block
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Row indices i < j of each pair
+        and their similarities, highest similarity first
+    """
+    matrix = sp.csr_matrix(matrix)
+    n_rows = matrix.shape[0]
+    transposed = matrix.T.tocsc()
+    rows, cols, scores = [], [], []
+
+    for start in range(0, n_rows, block_size):
+        block = (matrix[start:start + block_size] @ transposed).tocoo()
+        block_rows = block.row.astype(np.int64) + start
+        block_cols = block.col.astype(np.int64)
+        # Self-similarity is never a match
+        keep = (block.data >= threshold) & (block_rows != block_cols)
+        block_rows, block_cols, block_scores = block_rows[keep], block_cols[keep], block.data[keep]
+
+        if top_k is None:
+            # Every pair is found from both of its rows; keep the upper triangle only
+            upper = block_cols > block_rows
+            rows.append(block_rows[upper])
+            cols.append(block_cols[upper])
+            scores.append(block_scores[upper])
+            continue
+
+        # Rank partners within each row, best first, and keep the first top_k
+        order = np.lexsort((-block_scores, block_rows))
+        block_rows, block_cols, block_scores = block_rows[order], block_cols[order], block_scores[order]
+        rank = np.arange(len(block_rows)) - np.searchsorted(block_rows, block_rows, side='left')
+        best = rank < top_k
+        rows.append(np.minimum(block_rows[best], block_cols[best]))
+        cols.append(np.maximum(block_rows[best], block_cols[best]))
+        scores.append(block_scores[best])
+
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    scores = np.concatenate(scores).astype(np.float64)
+
+    if top_k is not None and len(rows):
+        # A pair ranked by both of its documents was emitted twice
+        _, first = np.unique(rows * n_rows + cols, return_index=True)
+        rows, cols, scores = rows[first], cols[first], scores[first]
+
+    order = np.argsort(-scores, kind='stable')
+    return rows[order], cols[order], scores[order]
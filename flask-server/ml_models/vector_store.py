@@ -0,0 +1,116 @@
+import numpy as np
+import scipy.sparse as sp
+from typing import Dict, List, Tuple
+
+
+class TfidfVectorStore:
+    def __init__(self, n_features: int = 2 ** 18):
+        """
+        Incremental TF-IDF store for the submissions of one assignment.
+
+        Term counts come from a stateless ``HashingVectorizer``, so vectorizing a
+        document never depends on (or mutates) shared state and is safe from any
+        thread. Document frequencies are maintained on insert/remove, and IDF
+        weighting is applied at query time, which reproduces
+        ``TfidfVectorizer(stop_words='english')`` scores without re-tokenizing
+        the corpus.
+
+        Args:
+            n_features (int): Size of the hashed feature space
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(
+            stop_words='english',
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None
+        )
+        self.vectors: Dict[str, sp.csr_matrix] = {}
+        self.document_frequency = np.zeros(n_features, dtype=np.int32)
+        self._ids: List[str] = []
+        self._matrix = None
+
+    def vectorize(self, text: str) -> sp.csr_matrix:
+        """Return the 1 x n_features term-count row of a text."""
+        return self.vectorizer.transform([text or ""]).tocsr()
+
+    @staticmethod
+    def pack(vector: sp.csr_matrix) -> bytes:
+        """Pack a term-count row as int32 indices followed by float32 counts."""
+        return vector.indices.astype('<i4').tobytes() + vector.data.astype('<f4').tobytes()
+
+    def unpack(self, data: bytes) -> sp.csr_matrix:
+        """Rebuild a term-count row from ``pack`` output."""
+        nnz = len(data) // 8
+        indices = np.frombuffer(data, dtype='<i4', count=nnz)
+        values = np.frombuffer(data, dtype='<f4', offset=nnz * 4, count=nnz).astype(np.float64)
+        return sp.csr_matrix((values, indices, [0, nnz]), shape=(1, self.n_features))
+
+    def upsert(self, submission_id: str, vector: sp.csr_matrix):
+        """Insert or replace the vector of a submission."""
+        self.remove(submission_id)
+        self.vectors[submission_id] = vector
+        self.document_frequency[vector.indices] += 1
+        self._matrix = None
+
+    def remove(self, submission_id: str):
+        """Drop a submission's vector if it is stored."""
+        vector = self.vectors.pop(submission_id, None)
+        if vector is not None:
+            self.document_frequency[vector.indices] -= 1
+            self._matrix = None
+
+    def _stacked(self):
+        if self._matrix is None:
+            self._ids = list(self.vectors)
+            if self._ids:
+                self._matrix = sp.vstack([self.vectors[sid] for sid in self._ids]).tocsr()
+            else:
+                self._matrix = sp.csr_matrix((0, self.n_features))
+        return self._ids, self._matrix
+
+    def query(self, vector: sp.csr_matrix, exclude: str = None) -> List[Tuple[str, float]]:
+        """
+        Score a document against every stored submission with TF-IDF cosine similarity.
+
+        Only the stored count matrix is reweighted; no stored text is touched.
+
+        Args:
+            vector (csr_matrix): Term-count row of the document being checked
+            exclude (str): Submission id to leave out (e.g. the document itself)
+
+        Returns:
+            List[Tuple[str, float]]: (submission id, similarity) for every other submission
+        """
+        ids, matrix = self._stacked()
+        keep = np.array([sid != exclude for sid in ids], dtype=bool)
+        if not keep.any():
+            return []
+
+        # Corpus = the other stored submissions plus the document being checked
+        document_frequency = self.document_frequency.astype(np.float64)
+        if exclude in self.vectors:
+            document_frequency[self.vectors[exclude].indices] -= 1
+        document_frequency[vector.indices] += 1
+        n_documents = int(keep.sum()) + 1
+        idf = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+
+        weighted = matrix.copy()
+        weighted.data = weighted.data * idf[weighted.indices]
+        row_norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        row_norms[row_norms == 0] = 1.0
+
+        query_weights = vector.data * idf[vector.indices]
+        query_norm = np.sqrt(np.dot(query_weights, query_weights)) or 1.0
+        query_vector = sp.csr_matrix(
+            (query_weights / query_norm, vector.indices, [0, len(vector.indices)]),
+            shape=(1, self.n_features)
+        )
+
+        scores = np.asarray((weighted @ query_vector.T).todense()).ravel() / row_norms
+        return [(sid, float(score)) for sid, score, kept in zip(ids, scores, keep) if kept]
+
+    def __len__(self):
+        return len(self.vectors)
@@ -0,0 +1,151 @@
+"""
+Winnowing fingerprints (Schleimer, Wilkerson and Aiken, the MOSS algorithm).
+
+Text is normalized to lowercase letters and digits, every k-gram is hashed and
+the minimum hash of each window of ``window`` consecutive k-grams is kept.
+Any shared passage of at least ``window + k - 1`` normalized characters is
+guaranteed to share a fingerprint. Each fingerprint keeps its position in the
+normalized text and the span it covers in the original text, so matches can be
+reported as character ranges of ``ocr_text`` without re-tokenizing.
+"""
+import re
+import numpy as np
+from typing import Dict, List
+
+DEFAULT_K = 25
+DEFAULT_WINDOW = 20
+
+# Fingerprints repeated more often than this in one document are boilerplate
+MAX_OCCURRENCES = 8
+
+# Packed layout: hash, normalized position, original start, original end
+FINGERPRINT_DTYPE = np.dtype([('hash', '<u8'), ('position', '<u4'), ('start', '<u4'), ('end', '<u4')])
+
+_WORD_CHARACTER = re.compile(r'[^\W_]')
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer; spreads polynomial k-gram hashes over 64 bits."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def fingerprint(text: str, k: int = DEFAULT_K, window: int = DEFAULT_WINDOW) -> np.ndarray:
+    """
+    Compute the winnowed fingerprints of a text.
+
+    Args:
+        text (str): Original text (e.g. ``ocr_text``)
+        k (int): k-gram length in normalized characters
+        window (int): Winnowing window in k-grams
+
+    Returns:
+        np.ndarray: Structured array of FINGERPRINT_DTYPE ordered by position
+    """
+    offsets = np.array([match.start() for match in _WORD_CHARACTER.finditer(text or "")], dtype=np.int64)
+    if len(offsets) < k:
+        return np.zeros(0, dtype=FINGERPRINT_DTYPE)
+    # Lowercase per character, keeping one code point per offset ('İ'.lower() has two)
+    normalized = ''.join(text[offset].lower()[0] for offset in offsets)
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+
+    # Polynomial hash of every k-gram, uint64 wraparound as the modulus
+    powers = np.full(k, 1099511628211, dtype=np.uint64) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    grams = np.lib.stride_tricks.sliding_window_view(codes, k)
+    hashes = _mix64((grams * powers).sum(axis=1, dtype=np.uint64))
+
+    # Rightmost minimum of every window, each selected k-gram recorded once
+    if len(hashes) <= window:
+        selected = np.array([len(hashes) - 1 - int(np.argmin(hashes[::-1]))])
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+        selected = np.arange(len(windows)) + window - 1 - np.argmin(windows[:, ::-1], axis=1)
+        selected = np.unique(selected)
+
+    result = np.zeros(len(selected), dtype=FINGERPRINT_DTYPE)
+    result['hash'] = hashes[selected]
+    result['position'] = selected
+    result['start'] = offsets[selected]
+    result['end'] = offsets[selected + k - 1] + 1
+    return result
+
+
+def pack(fingerprints: np.ndarray) -> bytes:
+    return fingerprints.astype(FINGERPRINT_DTYPE).tobytes()
+
+
+def unpack(data: bytes) -> np.ndarray:
+    return np.frombuffer(data or b'', dtype=FINGERPRINT_DTYPE)
+
+
+def match_spans(first: np.ndarray, second: np.ndarray, k: int = DEFAULT_K,
+                window: int = DEFAULT_WINDOW, min_fingerprints: int = 2) -> List[Dict]:
+    """
+    Align two fingerprint sets into matching passages.
+
+    Shared fingerprints are grouped by diagonal (offset between their normalized
+    positions); runs on one diagonal whose gaps are within a window become one
+    passage. Work is linear in the fingerprints plus the shared pairs.
+
+    Args:
+        first (np.ndarray): Fingerprints of the first text
+        second (np.ndarray): Fingerprints of the second text
+        k (int): k-gram length used for both
+        window (int): Winnowing window used for both
+        min_fingerprints (int): Shared fingerprints needed to report a passage
+
+    Returns:
+        List[Dict]: Passages as original-text character ranges ('start'/'end' in
+        the first text, 'other_start'/'other_end' in the second) with the number
+        of shared fingerprints, in order of the first text
+    """
+    if len(first) == 0 or len(second) == 0:
+        return []
+
+    occurrences: Dict[int, List[int]] = {}
+    for index, value in enumerate(second['hash'].tolist()):
+        occurrences.setdefault(value, []).append(index)
+
+    pairs = []
+    for index, value in enumerate(first['hash'].tolist()):
+        matches = occurrences.get(value)
+        if matches and len(matches) <= MAX_OCCURRENCES:
+            pairs.extend((index, other) for other in matches)
+    if not pairs:
+        return []
+
+    pairs = np.array(pairs, dtype=np.int64)
+    first_positions = first['position'][pairs[:, 0]].astype(np.int64)
+    second_positions = second['position'][pairs[:, 1]].astype(np.int64)
+    diagonals = second_positions - first_positions
+    order = np.lexsort((first_positions, diagonals))
+    pairs, first_positions, diagonals = pairs[order], first_positions[order], diagonals[order]
+
+    # A new passage starts on a new diagonal or after a gap longer than a window
+    breaks = np.flatnonzero(
+        (np.diff(diagonals) != 0) | (np.diff(first_positions) > window + k)
+    ) + 1
+    spans = []
+    for group in np.split(np.arange(len(pairs)), breaks):
+        if len(group) < min_fingerprints:
+            continue
+        head, tail = pairs[group[0]], pairs[group[-1]]
+        spans.append({
+            'start': int(first['start'][head[0]]),
+            'end': int(first['end'][tail[0]]),
+            'other_start': int(second['start'][head[1]]),
+            'other_end': int(second['end'][tail[1]]),
+            'fingerprints': int(len(group))
+        })
+
+    # Keep the longest of overlapping passages in the first text
+    spans.sort(key=lambda span: (span['start'], -(span['end'] - span['start'])))
+    merged = []
+    for span in spans:
+        if merged and span['end'] <= merged[-1]['end']:
+            continue
+        merged.append(span)
+    return merged
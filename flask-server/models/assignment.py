@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, DateTimeField, ReferenceField, FileField, BooleanField, ValidationError, ListField
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, FileField, BooleanField, ValidationError, ListField, BinaryField
 from datetime import datetime
 from .user import User
 
@@ -10,6 +10,11 @@ class Assignment(Document):
     question_file = FileField(required=True)
     model_answer_file = FileField(required=False)  # PDF file for model answer
     model_answer_text = StringField()  # Extracted text from model answer PDF
+    model_answer_chunks = BinaryField()  # Window embeddings of the model answer (float16)
+    model_answer_embedding_key = StringField()  # Model, model version and chunking of the embeddings
+    model_answer_text_hash = StringField()  # SHA-1 of the model answer text the embeddings were made from
+    model_answer_status = StringField(choices=['Pending', 'Processing', 'Completed', 'Failed'])  # Extraction by the worker
+    model_answer_error = StringField()
     sections = ListField(StringField(), required=True)  # List of section IDs
     status = StringField(default='Active', choices=['Active', 'Archived'])
     professor = ReferenceField(User, required=True)  # Reference to the professor who created it
@@ -51,6 +56,8 @@ class Assignment(Document):
             "has_file": bool(self.question_file),
             "has_model_answer": bool(self.model_answer_file),
             "model_answer_text": self.model_answer_text,
+            "model_answer_status": self.model_answer_status,
+            "model_answer_error": self.model_answer_error,
             "status": self.status,
             "professor_id": str(self.professor.id),
             "professor_name": f"{self.professor.first_name} {self.professor.last_name}",
@@ -0,0 +1,19 @@
+from mongoengine import Document, ObjectIdField, StringField, DateTimeField, BinaryField, ListField, LongField
+from datetime import datetime
+
+class SubmissionFingerprint(Document):
+    submission = ObjectIdField(required=True, unique=True)  # Kept after the assignment is archived
+    assignment = ObjectIdField(required=True)
+    student = ObjectIdField()
+    course = StringField(required=True)
+    submitted_at = DateTimeField(default=datetime.utcnow)
+    signature = BinaryField()  # MinHash signature packed as uint32 bytes
+    bands = ListField(LongField())  # One hash per LSH band, matched with $in
+
+    meta = {
+        'collection': 'submission_fingerprints',
+        'indexes': [
+            ('course', 'bands', 'submitted_at'),
+            ('bands', 'submitted_at')
+        ]
+    }
@@ -0,0 +1,18 @@
+from mongoengine import Document, ObjectIdField, DateTimeField
+from datetime import datetime
+
+# Processes whose indexes last synced longer ago than this rebuild them instead
+TOMBSTONE_TTL_SECONDS = 7 * 24 * 3600
+
+class IndexTombstone(Document):
+    assignment = ObjectIdField(required=True)
+    submission = ObjectIdField(required=True)  # Deleted submission to drop from in-process indexes
+    deleted_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'index_tombstones',
+        'indexes': [
+            ('assignment', 'deleted_at'),
+            {'fields': ['deleted_at'], 'expireAfterSeconds': TOMBSTONE_TTL_SECONDS}
+        ]
+    }
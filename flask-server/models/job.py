@@ -0,0 +1,46 @@
+from mongoengine import Document, StringField, DateTimeField, IntField
+from datetime import datetime
+
+class ProcessingJob(Document):
+    job_type = StringField(required=True, choices=['process_submission', 'assignment_analysis', 'extract_model_answer'])
+    target_id = StringField(required=True)  # Id of the document the job works on
+    status = StringField(default='queued', choices=['queued', 'running', 'completed', 'failed'])
+    attempts = IntField(default=0)
+    max_attempts = IntField(default=3)
+    run_after = DateTimeField(default=datetime.utcnow)  # Not claimable before this time (retry backoff)
+    lease_expires_at = DateTimeField()  # A running job whose lease expired is claimable again
+    worker_id = StringField()  # Worker currently holding the lease
+    last_error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    completed_at = DateTimeField()
+
+    meta = {
+        'collection': 'processing_jobs',
+        'indexes': [
+            ('status', 'run_after', 'created_at'),
+            ('status', 'lease_expires_at'),
+            ('job_type', 'target_id', 'status'),
+            # At most one queued job per target, so concurrent enqueues cannot duplicate work
+            {
+                'fields': ('job_type', 'target_id'),
+                'unique': True,
+                'partialFilterExpression': {'status': 'queued'},
+                'name': 'one_queued_job_per_target'
+            }
+        ]
+    }
+
+    def to_json(self):
+        return {
+            "id": str(self.id),
+            "job_type": self.job_type,
+            "target_id": self.target_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "worker_id": self.worker_id,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat(),
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
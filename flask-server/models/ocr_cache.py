@@ -0,0 +1,21 @@
+from mongoengine import Document, StringField, DateTimeField, IntField, DictField
+from datetime import datetime
+
+class OCRCacheEntry(Document):
+    key = StringField(required=True, unique=True)  # "<sha256>:<engine version>"
+    sha256 = StringField(required=True)  # SHA-256 of the PDF bytes
+    engine_version = StringField(required=True)  # OCR engine and configuration the text came from
+    text = StringField()
+    details = DictField()  # Per-page details from the original extraction
+    size_bytes = IntField(default=0)  # Approximate stored size, used for eviction
+    hits = IntField(default=0)
+    created_at = DateTimeField(default=datetime.utcnow)
+    last_used_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'ocr_cache',
+        'indexes': [
+            'last_used_at',
+            'sha256'
+        ]
+    }
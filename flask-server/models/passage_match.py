@@ -0,0 +1,19 @@
+from mongoengine import Document, StringField, ObjectIdField, ListField, DictField, IntField, DateTimeField
+from datetime import datetime
+
+class PassageMatch(Document):
+    key = StringField(required=True, unique=True)  # "<id a>:<id b>:<text hash a>:<text hash b>", ids sorted
+    submission_a = ObjectIdField(required=True)
+    submission_b = ObjectIdField(required=True)
+    spans = ListField(DictField())  # start/end in a, other_start/other_end in b, fingerprints
+    matched_chars_a = IntField(default=0)
+    matched_chars_b = IntField(default=0)
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'passage_matches',
+        'indexes': [
+            'submission_a',
+            'submission_b'
+        ]
+    }
@@ -0,0 +1,53 @@
+from mongoengine import Document, ReferenceField, StringField, IntField, FloatField, ListField, DictField, DateTimeField
+from datetime import datetime
+from .assignment import Assignment
+
+class PlagiarismAnalysis(Document):
+    assignment = ReferenceField(Assignment, required=True)
+    version = IntField(required=True)  # 1, 2, ... per assignment
+    status = StringField(default='queued', choices=['queued', 'running', 'completed', 'failed'])
+    corpus_key = StringField()  # Hash of the analyzed submission ids and their extract and embed stage keys
+    detector_settings = DictField()  # num_perm and thresholds used
+    exact_copies = ListField(DictField())
+    paraphrases = ListField(DictField())
+    semantic_matches = ListField(DictField())
+    clusters = ListField(DictField())
+    statistics = DictField()
+    suspicious_ids = ListField(StringField())
+    error = StringField()
+    seconds = FloatField()  # Wall time of the analysis run
+    created_at = DateTimeField(default=datetime.utcnow)
+    started_at = DateTimeField()
+    completed_at = DateTimeField()
+
+    meta = {
+        'collection': 'plagiarism_analyses',
+        'indexes': [
+            {'fields': ('assignment', 'version'), 'unique': True},
+            ('assignment', 'status', '-version')
+        ]
+    }
+
+    def to_json(self, include_results=True):
+        data = {
+            "id": str(self.id),
+            "assignment_id": str(self.assignment.id),
+            "version": self.version,
+            "status": self.status,
+            "detector_settings": self.detector_settings,
+            "statistics": self.statistics,
+            "error": self.error,
+            "seconds": self.seconds,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
+        if include_results:
+            data.update({
+                "exact_copies": self.exact_copies,
+                "paraphrases": self.paraphrases,
+                "semantic_matches": self.semantic_matches,
+                "clusters": self.clusters,
+                "suspicious_ids": self.suspicious_ids
+            })
+        return data
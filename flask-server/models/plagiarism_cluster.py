@@ -0,0 +1,24 @@
+from mongoengine import Document, ReferenceField, ListField, DictField, IntField, DateTimeField
+from datetime import datetime
+from .assignment import Assignment
+
+class AssignmentClusters(Document):
+    assignment = ReferenceField(Assignment, required=True, unique=True)
+    edges = ListField(DictField())  # {'submission_ids': [a, b], 'type': ..., 'similarity_score': ...}
+    clusters = ListField(DictField())  # Connected copy rings built from the edges
+    edges_version = IntField(default=0)  # Incremented on every edge change
+    clusters_version = IntField(default=0)  # edges_version the clusters were built from
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'plagiarism_clusters'
+    }
+
+    def to_json(self):
+        return {
+            "assignment_id": str(self.assignment.id),
+            "clusters": self.clusters,
+            "edge_count": len(self.edges),
+            "up_to_date": self.clusters_version == self.edges_version,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
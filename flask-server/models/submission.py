@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, DateTimeField, ReferenceField, FloatField, FileField, DictField
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, FloatField, FileField, DictField, BinaryField
 from datetime import datetime
 from .user import User
 from .assignment import Assignment
@@ -15,6 +15,8 @@ class Submission(Document):
     
     # New fields for OCR and plagiarism
     ocr_text = StringField()  # Extracted text from PDF
+    ocr_details = DictField()  # Per-page OCR timings and failures
+    file_sha256 = StringField()  # SHA-256 of the answer file bytes
     plagiarism_score = FloatField()  # Overall plagiarism percentage
     plagiarism_details = DictField()  # Detailed plagiarism results
     plagiarism_result = StringField()  # 'found' or 'not found'
@@ -24,6 +26,14 @@ class Submission(Document):
     correctness_label = StringField()  # Correct/Partially Correct/Incorrect
     final_score = FloatField()  # Score after plagiarism penalty
     plagiarism_severity = StringField(choices=['easy', 'medium', 'hard'], default='medium')
+    stage_keys = DictField()  # Input key of each processing stage's stored result
+    minhash_signature = BinaryField()  # MinHash signature packed as uint32 bytes
+    tfidf_vector = BinaryField()  # Hashed term counts (int32 indices + float32 counts)
+    embedding = BinaryField()  # Sentence embedding as float16 bytes
+    embedding_model = StringField()  # Model that produced the embedding
+    embedding_chunks = BinaryField()  # Window embeddings used for correctness scoring (float16)
+    winnow_fingerprints = BinaryField()  # Positional winnowing fingerprints (ml_models/winnowing.py)
+    index_updated_at = DateTimeField()  # When the fingerprints above last changed
 
     meta = {
         'collection': 'submissions',
@@ -31,7 +41,9 @@ class Submission(Document):
             ('student', 'assignment'),
             'submitted_at',
             'status',
-            'processing_status'
+            'processing_status',
+            ('assignment', 'index_updated_at'),
+            ('assignment', 'file_sha256')
         ]
     }
 
@@ -1,18 +1,30 @@
-from flask import Blueprint, request, jsonify, session, send_file, current_app
+from flask import Blueprint, request, jsonify, session, current_app
 from werkzeug.utils import secure_filename
 from models.user import User
 from models.assignment import Assignment
 from models.submission import Submission
-from utils.document_processor import document_processor
+from models.plagiarism_analysis import PlagiarismAnalysis
+from models.index_tombstone import IndexTombstone
+from utils.lazy import LazyObject
+from utils.file_streaming import send_gridfs_file
+from utils.cluster_store import cluster_store
+from utils.fingerprint_corpus import fingerprint_corpus
+from utils.passage_matches import passage_matcher
+from utils.plagiarism_flags import plagiarism_flags
+from utils.job_queue import job_queue, QueueFullError
+from utils.scoring import PENALTY_MAP, compute_final_score, compute_final_scores
 import os
 import uuid
 import datetime
+import time
 import logging
 from functools import wraps
-import io
 from mongoengine.errors import ValidationError
-from ml_models.ocr_processor import OCRProcessor
-import tempfile
+from pymongo import UpdateOne
+
+# The ML stack (sklearn, datasketch, scipy, sentence-transformers) is only
+# imported when a route first uses this; uploads and deletes never do
+assignment_analyzer = LazyObject('utils.assignment_analysis', 'assignment_analyzer')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -198,16 +210,6 @@ def create_assignment():
             logger.error(f"Model answer file validation error: {model_answer_error}")
             return jsonify({'error': model_answer_error}), 400
 
-        # Extract text from model answer PDF
-        ocr = OCRProcessor()
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            model_answer_file.save(tmp_file)
-            tmp_file_path = tmp_file.name
-        try:
-            model_answer_text = ocr.extract_text_from_pdf(tmp_file_path)
-        finally:
-            os.remove(tmp_file_path)
-
         # Get current user
         try:
             current_user = User.objects.get(id=session['user_id'])
@@ -226,7 +228,8 @@ def create_assignment():
                 due_date=due_date,
                 sections=sections,
                 professor=current_user,
-                model_answer_text=model_answer_text
+                # Extracted and encoded by the worker (see worker.py)
+                model_answer_status='Pending'
             )
 
             # Save the files
@@ -250,6 +253,11 @@ def create_assignment():
             new_assignment.save()
 
             logger.info(f"Assignment created successfully with ID: {new_assignment.id}")
+            try:
+                job_queue.enqueue('extract_model_answer', new_assignment.id)
+            except Exception as e:
+                # The worker's recovery loop queues it later; the assignment itself was created
+                logger.error(f"Error queuing model answer extraction: {str(e)}")
             return jsonify(new_assignment.to_json()), 201
 
         except ValidationError as e:
@@ -300,7 +308,19 @@ def submit_assignment(assignment_id):
                 submission.plagiarism_score = None  # Clear previous plagiarism score
                 submission.plagiarism_details = None  # Clear previous details
                 submission.processing_error = None  # Clear any previous errors
+                submission.minhash_signature = None  # Fingerprints are recomputed from the new file
+                submission.tfidf_vector = None
+                submission.winnow_fingerprints = None
+                submission.embedding = None
+                submission.embedding_chunks = None
+                submission.file_sha256 = None
+                submission.index_updated_at = datetime.datetime.utcnow()
+                # Cleared fingerprints reach every process's index through index_updated_at
                 submission.save()
+                cluster_store.remove_submission(assignment.id, submission.id)
+                plagiarism_flags.remove_submission(assignment.id, submission.id)
+                fingerprint_corpus.remove(submission.id)
+                passage_matcher.remove_submission(submission.id)
             except Exception as e:
                 logger.error(f"Error updating submission file: {str(e)}")
                 return jsonify({'error': 'Failed to update submission file'}), 500
@@ -326,7 +346,8 @@ def submit_assignment(assignment_id):
 
         # Start asynchronous processing
         try:
-            document_processor.process_submission_async(submission.id)
+            # Queued for the worker; the web process never loads the processing pipeline
+            job_queue.enqueue('process_submission', submission.id)
             logger.info(f"Started processing for submission {submission.id}")
         except Exception as e:
             logger.error(f"Error starting document processing: {str(e)}")
@@ -365,9 +386,8 @@ def download_assignment(assignment_id):
             return jsonify({'error': 'Assignment file not found'}), 404
 
         try:
-            # Get the file from GridFS
-            file_data = assignment.question_file.read()
-            if not file_data:
+            # Only the GridFS file metadata is loaded here; chunks are streamed
+            if not assignment.question_file.length:
                 logger.error(f"Empty file data for assignment {assignment_id}")
                 return jsonify({'error': 'Assignment file is empty'}), 404
 
@@ -375,14 +395,10 @@ def download_assignment(assignment_id):
             content_type = assignment.question_file.content_type or 'application/pdf'
             filename = assignment.question_file.filename or f"{assignment.name}.pdf"
 
-            logger.info(f"Successfully retrieved file for assignment {assignment_id}")
-            logger.info(f"File details - Name: {filename}, Type: {content_type}, Size: {len(file_data)} bytes")
+            logger.info(f"File details - Name: {filename}, Type: {content_type}, Size: {assignment.question_file.length} bytes")
 
-            # Create file stream
-            file_stream = io.BytesIO(file_data)
-
-            return send_file(
-                file_stream,
+            return send_gridfs_file(
+                assignment.question_file,
                 mimetype=content_type,
                 as_attachment=True,
                 download_name=filename
@@ -482,7 +498,14 @@ def delete_submission(submission_id):
                 submission.answer_file.delete()
             except Exception:
                 pass
+        assignment_id = submission.assignment.id
         submission.delete()
+        # Every process's index drops the submission on its next sync
+        IndexTombstone(assignment=assignment_id, submission=submission.id).save()
+        cluster_store.remove_submission(assignment_id, submission_id)
+        plagiarism_flags.remove_submission(assignment_id, submission_id)
+        fingerprint_corpus.remove(submission_id)
+        passage_matcher.remove_submission(submission_id)
         return jsonify({'success': True, 'message': 'Submission deleted'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -504,10 +527,199 @@ def update_submission(submission_id):
             submission.plagiarism_severity = data['plagiarism_severity']
             updated = True
         if updated:
-            # Re-run processing to update final_score and related fields
-            from utils.document_processor import document_processor
-            document_processor._process_submission(str(submission.id))
-            submission.reload()
+            # Only the score depends on severity; OCR, correctness and plagiarism
+            # results are reused as stored, without loading the ML stack
+            submission.final_score = compute_final_score(
+                submission.correctness_score,
+                submission.plagiarism_result,
+                submission.plagiarism_severity
+            )
+            submission.save()
         return jsonify(submission.to_json()), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+@assignments_bp.route('/api/assignments/<assignment_id>/rescore', methods=['POST'])
+@login_required
+@professor_required
+def rescore_assignment(assignment_id):
+    """Apply a plagiarism severity to all (or selected) submissions and recompute final scores."""
+    try:
+        started = time.perf_counter()
+        assignment = Assignment.objects(id=assignment_id).first()
+        if not assignment:
+            return jsonify({'error': 'Assignment not found'}), 404
+        if str(assignment.professor.id) != session['user_id']:
+            return jsonify({'error': 'Not authorized'}), 403
+
+        data = request.get_json() or {}
+        severity = data.get('plagiarism_severity')
+        if severity is not None and severity not in PENALTY_MAP:
+            return jsonify({'error': f'Invalid plagiarism_severity. Allowed values are: {", ".join(PENALTY_MAP)}'}), 400
+
+        query = Submission.objects(assignment=assignment)
+        submission_ids = data.get('submission_ids')
+        if submission_ids:
+            query = query(id__in=submission_ids)
+        rows = list(query.only('id', 'correctness_score', 'plagiarism_result', 'plagiarism_severity').as_pymongo())
+        if not rows:
+            return jsonify({'matched': 0, 'modified': 0, 'submissions': 0, 'elapsed_ms': 0.0}), 200
+
+        severities = [severity or row.get('plagiarism_severity') for row in rows]
+        final_scores = compute_final_scores(
+            [row.get('correctness_score') for row in rows],
+            [row.get('plagiarism_result') for row in rows],
+            severities
+        )
+        updates = []
+        for row, row_severity, final_score in zip(rows, severities, final_scores):
+            fields = {'final_score': final_score}
+            if severity is not None:
+                fields['plagiarism_severity'] = row_severity
+            updates.append(UpdateOne({'_id': row['_id']}, {'$set': fields}))
+        result = Submission._get_collection().bulk_write(updates, ordered=False)
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"Rescored {len(rows)} submissions of assignment {assignment_id} in {elapsed_ms} ms")
+        return jsonify({
+            'matched': result.matched_count,
+            'modified': result.modified_count,
+            'submissions': len(rows),
+            'elapsed_ms': elapsed_ms
+        }), 200
+    except ValidationError as e:
+        logger.error(f"Validation error: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error rescoring assignment {assignment_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@assignments_bp.route('/api/assignments/<assignment_id>/plagiarism/clusters', methods=['GET'])
+@login_required
+@professor_required
+def get_plagiarism_clusters(assignment_id):
+    """Copy-ring clusters of an assignment, loaded from its single clusters document."""
+    try:
+        assignment = Assignment.objects(id=assignment_id).first()
+        if not assignment:
+            return jsonify({'error': 'Assignment not found'}), 404
+        if str(assignment.professor.id) != session['user_id']:
+            return jsonify({'error': 'Not authorized'}), 403
+
+        clusters = cluster_store.get(assignment.id)
+        if not clusters:
+            return jsonify({'assignment_id': assignment_id, 'clusters': [], 'edge_count': 0,
+                            'up_to_date': True, 'updated_at': None}), 200
+        return jsonify(clusters.to_json()), 200
+    except Exception as e:
+        logger.error(f"Error fetching plagiarism clusters for assignment {assignment_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@assignments_bp.route('/api/assignments/<assignment_id>/plagiarism/analysis', methods=['POST'])
+@login_required
+@professor_required
+def analyze_assignment(assignment_id):
+    """
+    Close and analyze: run exact-copy and paraphrase detection over the whole assignment.
+
+    Only allowed after the due date unless ``force`` is set, which also re-runs
+    an analysis whose cached result is still current.
+    """
+    try:
+        assignment = Assignment.objects(id=assignment_id).first()
+        if not assignment:
+            return jsonify({'error': 'Assignment not found'}), 404
+        if str(assignment.professor.id) != session['user_id']:
+            return jsonify({'error': 'Not authorized'}), 403
+
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force'))
+        due_date = assignment.due_date
+        if due_date.tzinfo is not None:
+            due_date = due_date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if not force and datetime.datetime.utcnow() < due_date:
+            return jsonify({'error': 'Assignment is still open; pass force to analyze before the due date'}), 409
+
+        analysis, queued = assignment_analyzer.request(assignment, force=force)
+        status_code = 202 if analysis.status in ['queued', 'running'] else 200
+        return jsonify({**analysis.to_json(include_results=False), 'queued': queued}), status_code
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error starting plagiarism analysis for assignment {assignment_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@assignments_bp.route('/api/assignments/<assignment_id>/plagiarism/analysis', methods=['GET'])
+@login_required
+@professor_required
+def get_assignment_analysis(assignment_id):
+    """Latest completed analysis (or ``?version=N``), plus the status of any run in progress."""
+    try:
+        assignment = Assignment.objects(id=assignment_id).first()
+        if not assignment:
+            return jsonify({'error': 'Assignment not found'}), 404
+        if str(assignment.professor.id) != session['user_id']:
+            return jsonify({'error': 'Not authorized'}), 403
+
+        version = request.args.get('version', type=int)
+        if version is not None:
+            analysis = PlagiarismAnalysis.objects(assignment=assignment, version=version).first()
+            if not analysis:
+                return jsonify({'error': f'Analysis version {version} not found'}), 404
+        else:
+            analysis = assignment_analyzer.latest(assignment.id, status='completed')
+        latest = assignment_analyzer.latest(assignment.id)
+        if not analysis and not latest:
+            return jsonify({'error': 'No analysis has been run for this assignment'}), 404
+
+        return jsonify({
+            'analysis': analysis.to_json() if analysis else None,
+            'latest': latest.to_json(include_results=False) if latest else None
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching plagiarism analysis for assignment {assignment_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@assignments_bp.route('/api/submissions/<submission_id>/matches/<other_id>', methods=['GET'])
+@login_required
+@professor_required
+def get_matched_passages(submission_id, other_id):
+    """Matched passages between two submissions, from the cached winnowing alignment."""
+    try:
+        submission = Submission.objects(id=submission_id).first()
+        other = Submission.objects(id=other_id).first()
+        if not submission or not other:
+            return jsonify({'error': 'Submission not found'}), 404
+        user_id = session['user_id']
+        if str(submission.assignment.professor.id) != user_id:
+            return jsonify({'error': 'Not authorized'}), 403
+        # The other submission must be the professor's own or reported as reused from
+        cross_matches = ((submission.plagiarism_details or {}).get('cross_assignment') or {}).get('matches', [])
+        if (str(other.assignment.professor.id) != user_id
+                and other_id not in [match['submission_id'] for match in cross_matches]):
+            return jsonify({'error': 'Not authorized'}), 403
+
+        result = passage_matcher.matches(submission.id, other.id)
+        if result is None:
+            return jsonify({'error': 'Submissions have not been fingerprinted yet'}), 409
+
+        text, other_text = submission.ocr_text or "", other.ocr_text or ""
+        return jsonify({
+            'submission_id': submission_id,
+            'other_submission_id': other_id,
+            'matched_chars': result['matched_chars'],
+            'other_matched_chars': result['other_matched_chars'],
+            'coverage': round(result['matched_chars'] * 100 / len(text), 2) if text else 0.0,
+            'spans': [
+                {
+                    **span,
+                    'text': text[span['start']:span['end']],
+                    'other_text': other_text[span['other_start']:span['other_end']]
+                }
+                for span in result['spans']
+            ]
+        }), 200
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching matched passages for {submission_id} and {other_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
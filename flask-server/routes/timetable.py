@@ -1,7 +1,7 @@
-from flask import Blueprint, jsonify, session, request, send_file
+from flask import Blueprint, jsonify, session, request
 from models.timetable import TimetablePDF
 from decorators import login_required, professor_required, student_required
-import io
+from utils.file_streaming import send_gridfs_file
 
 timetable_bp = Blueprint('timetable', __name__)
 
@@ -56,8 +56,8 @@ def get_timetable_pdf(section):
     timetable = TimetablePDF.objects(section=section).first()
     if not timetable or not timetable.pdf_file:
         return jsonify({'error': 'No timetable found for this section'}), 404
-    return send_file(
-        io.BytesIO(timetable.pdf_file.read()),
+    return send_gridfs_file(
+        timetable.pdf_file,
         mimetype='application/pdf',
         as_attachment=True,
         download_name=f'timetable_{section}.pdf'
@@ -1,7 +1,7 @@
-from flask import Blueprint, request, jsonify, current_app, session, send_file
+from flask import Blueprint, request, jsonify, current_app, session
 from models.user import User
+from utils.file_streaming import send_gridfs_file
 import logging
-import io
 
 # Import decorators with error handling
 try:
@@ -106,8 +106,8 @@ def get_professor_profile_image():
         current_user = User.objects.get(id=session['user_id'])
         if not current_user.profile_image:
             return jsonify({'error': 'No profile image'}), 404
-        return send_file(
-            io.BytesIO(current_user.profile_image.read()),
+        return send_gridfs_file(
+            current_user.profile_image,
             mimetype=current_user.profile_image.content_type or 'image/jpeg',
             as_attachment=False,
             download_name='profile.jpg'
@@ -191,8 +191,8 @@ def get_student_profile_image():
         current_user = User.objects.get(id=session['user_id'])
         if not current_user.profile_image:
             return jsonify({'error': 'No profile image'}), 404
-        return send_file(
-            io.BytesIO(current_user.profile_image.read()),
+        return send_gridfs_file(
+            current_user.profile_image,
             mimetype=current_user.profile_image.content_type or 'image/jpeg',
             as_attachment=False,
             download_name='profile.jpg'
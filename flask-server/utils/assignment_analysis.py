@@ -0,0 +1,237 @@
+import datetime
+import hashlib
+import logging
+import time
+from bson import ObjectId
+from mongoengine.errors import NotUniqueError
+from pymongo import UpdateOne
+from models.submission import Submission
+from models.plagiarism_analysis import PlagiarismAnalysis
+from ml_models.cheating_detector import CheatingDetector
+from ml_models.ann_index import unpack_embedding
+from ml_models.model_registry import DEFAULT_MODEL
+from utils.cluster_store import cluster_store
+from utils.job_queue import job_queue
+from utils.plagiarism_flags import plagiarism_result
+from utils.scoring import compute_final_scores
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['queued', 'running']
+
+
+class AssignmentAnalyzer:
+    def __init__(self, num_perm: int = 128, exact_threshold: float = 0.5, paraphrase_threshold: float = 0.7,
+                 semantic_threshold: float = None):
+        """
+        Assignment-wide plagiarism analysis run as one batched pass.
+
+        Each run is stored as a new, numbered ``PlagiarismAnalysis``. A request
+        for an unchanged corpus with unchanged detector settings is answered from
+        the latest completed analysis instead of running again.
+
+        Args:
+            num_perm (int): Number of MinHash permutations
+            exact_threshold (float): Threshold for exact copy detection
+            paraphrase_threshold (float): Threshold for paraphrase detection
+            semantic_threshold (float): Threshold for semantic near-duplicates,
+                defaults to the pre-screen's ``Config.PLAGIARISM_SEMANTIC_THRESHOLD``
+        """
+        self.settings = {
+            'num_perm': num_perm,
+            'exact_threshold': exact_threshold,
+            'paraphrase_threshold': paraphrase_threshold,
+            'semantic_threshold': semantic_threshold or Config.PLAGIARISM_SEMANTIC_THRESHOLD
+        }
+
+    @staticmethod
+    def _corpus_query(assignment_id):
+        return Submission.objects(assignment=assignment_id, processing_status='Completed', ocr_text__ne=None)
+
+    def corpus_key(self, assignment_id):
+        """
+        Fingerprint of the analyzable submissions without reading their text.
+
+        The extract stage key identifies the stored file and OCR engine, which
+        determine the text; the embed stage key the text and embedding model.
+        """
+        rows = self._corpus_query(assignment_id).only('id', 'stage_keys', 'index_updated_at').as_pymongo()
+        parts = sorted(
+            f"{row['_id']}:{(row.get('stage_keys') or {}).get('extract') or row.get('index_updated_at')}"
+            f":{(row.get('stage_keys') or {}).get('embed')}"
+            for row in rows
+        )
+        return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def latest(self, assignment_id, status=None):
+        query = PlagiarismAnalysis.objects(assignment=assignment_id)
+        if status:
+            query = query(status=status)
+        return query.order_by('-version').first()
+
+    def request(self, assignment, force=False):
+        """
+        Start an analysis of an assignment unless an equivalent one exists.
+
+        Args:
+            assignment (Assignment): Assignment to analyze
+            force (bool): Run even if the cached analysis is still current, and
+                replace a queued or running analysis whose job is gone right away
+
+        Returns:
+            Tuple[PlagiarismAnalysis, bool]: The analysis and whether a new run was queued
+
+        Raises:
+            QueueFullError: If the processing queue is full
+        """
+        active = PlagiarismAnalysis.objects(assignment=assignment, status__in=ACTIVE_STATUSES).first()
+        if active:
+            if not self._stale(active, force):
+                return active, False
+            logger.warning(f"Analysis {active.id} has no queued or running job, marking it failed")
+            self.fail(active.id, "Analysis job was lost")
+
+        if not force:
+            cached = self.latest(assignment.id, status='completed')
+            if (cached and cached.detector_settings == self.settings
+                    and cached.corpus_key == self.corpus_key(assignment.id)):
+                return cached, False
+
+        previous = self.latest(assignment.id)
+        try:
+            analysis = PlagiarismAnalysis(
+                assignment=assignment,
+                version=(previous.version if previous else 0) + 1,
+                detector_settings=self.settings
+            ).save()
+        except NotUniqueError:
+            # A concurrent request created this version first
+            return self.latest(assignment.id), False
+
+        try:
+            job_queue.enqueue('assignment_analysis', analysis.id)
+        except Exception as e:
+            self.fail(analysis.id, e)
+            raise
+        return analysis, True
+
+    @staticmethod
+    def _stale(analysis, force=False):
+        """
+        True if a queued or running analysis has no job left to finish it.
+
+        A job whose lease expired is still reclaimed by a worker, so only a job
+        that was given up or never enqueued makes the analysis stale. Without
+        ``force``, an analysis younger than the job lease is never stale, since
+        its job may be being enqueued right now.
+        """
+        if job_queue.active_targets('assignment_analysis', [analysis.id]):
+            return False
+        if force:
+            return True
+        age = datetime.datetime.utcnow() - (analysis.started_at or analysis.created_at)
+        return age > datetime.timedelta(seconds=Config.JOB_LEASE_SECONDS)
+
+    def run(self, analysis_id):
+        """Run a queued analysis: detect, store results, clusters and per-submission outcomes."""
+        analysis = PlagiarismAnalysis.objects(id=analysis_id).first()
+        if not analysis or analysis.status == 'completed':
+            return
+
+        started = time.perf_counter()
+        assignment_id = analysis.assignment.id
+        analysis.update(set__status='running', set__started_at=datetime.datetime.utcnow())
+
+        corpus_key = self.corpus_key(assignment_id)
+        rows = [
+            row for row in self._corpus_query(assignment_id).only(
+                'id', 'ocr_text', 'embedding', 'embedding_model').as_pymongo()
+            if (row.get('ocr_text') or '').strip()
+        ]
+        # Embeddings of another model are not comparable, as in the pre-screen's index
+        submissions = [{
+            'id': str(row['_id']),
+            'text': row['ocr_text'],
+            'embedding': unpack_embedding(bytes(row['embedding']))
+            if row.get('embedding') and row.get('embedding_model') == DEFAULT_MODEL else None
+        } for row in rows]
+        del rows
+
+        if len(submissions) < 2:
+            result = {'exact_copies': [], 'paraphrases': [], 'semantic_matches': [], 'clusters': [],
+                      'suspicious_ids': [],
+                      'statistics': {'total_submissions': len(submissions), 'suspicious_submissions': 0}}
+        else:
+            detector = CheatingDetector(**self.settings)
+            result = detector.analyze_submissions(submissions)
+            if result.get('error'):
+                raise RuntimeError(result['error'])
+
+        cluster_store.replace_edges(assignment_id,
+                                    result['exact_copies'] + result['paraphrases'] + result['semantic_matches'])
+        self._apply_results(assignment_id, [submission['id'] for submission in submissions],
+                            set(result['suspicious_ids']))
+
+        seconds = round(time.perf_counter() - started, 3)
+        analysis.update(
+            set__status='completed',
+            set__corpus_key=corpus_key,
+            set__exact_copies=result['exact_copies'],
+            set__paraphrases=result['paraphrases'],
+            set__semantic_matches=result['semantic_matches'],
+            set__clusters=result['clusters'],
+            set__statistics=result['statistics'],
+            set__suspicious_ids=result['suspicious_ids'],
+            set__seconds=seconds,
+            set__completed_at=datetime.datetime.utcnow(),
+            unset__error=True
+        )
+        logger.info(f"Analyzed {len(submissions)} submissions of assignment {assignment_id} "
+                    f"(version {analysis.version}) in {seconds}s")
+
+    @staticmethod
+    def _apply_results(assignment_id, submission_ids, suspicious_ids):
+        """
+        Record every analyzed submission's analysis outcome and derive its
+        plagiarism result and final score, in one bulk write.
+        """
+        if not submission_ids:
+            return
+        rows = list(Submission._get_collection().find(
+            {'_id': {'$in': [ObjectId(sid) for sid in submission_ids]}},
+            {'correctness_score': 1, 'plagiarism_severity': 1, 'plagiarism_details': 1}
+        ))
+        # Pre-screen and cross-assignment evidence stays flagged whatever this analysis says
+        found = [str(row['_id']) in suspicious_ids for row in rows]
+        results = [
+            plagiarism_result({**(row.get('plagiarism_details') or {}), 'analysis_found': analysis_found})
+            for row, analysis_found in zip(rows, found)
+        ]
+        final_scores = compute_final_scores(
+            [row.get('correctness_score') for row in rows],
+            results,
+            [row.get('plagiarism_severity') for row in rows]
+        )
+        Submission._get_collection().bulk_write([
+            UpdateOne({'_id': row['_id']}, {'$set': {
+                'plagiarism_details.analysis_found': analysis_found,
+                'plagiarism_result': result,
+                'final_score': final_score
+            }})
+            for row, analysis_found, result, final_score in zip(rows, found, results, final_scores)
+        ], ordered=False)
+
+    @staticmethod
+    def fail(analysis_id, error):
+        PlagiarismAnalysis.objects(id=analysis_id).update(
+            set__status='failed',
+            set__error=str(error),
+            set__completed_at=datetime.datetime.utcnow()
+        )
+
+
+# Create a global instance
+assignment_analyzer = AssignmentAnalyzer()
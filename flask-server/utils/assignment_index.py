@@ -0,0 +1,253 @@
+import datetime
+import logging
+import threading
+from typing import Dict, List, Set, Tuple
+from models.submission import Submission
+from models.index_tombstone import IndexTombstone, TOMBSTONE_TTL_SECONDS
+from ml_models.cheating_detector import CheatingDetector
+from ml_models.vector_store import TfidfVectorStore
+from ml_models.ann_index import EmbeddingIndex, unpack_embedding
+from ml_models.model_registry import DEFAULT_MODEL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Submissions written by other workers are picked up by re-reading everything
+# updated within this window before the last sync, so clock skew and
+# in-flight writes are not missed.
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+# An index last synced before this is rebuilt, its deletions may have expired
+TOMBSTONE_TTL = datetime.timedelta(seconds=TOMBSTONE_TTL_SECONDS)
+
+
+class AssignmentIndex:
+    """
+    In-process plagiarism indexes over the stored fingerprints of one assignment:
+    a MinHash LSH index, a TF-IDF vector store and an embedding ANN index.
+
+    They are built from ``Submission.minhash_signature``,
+    ``Submission.tfidf_vector`` and ``Submission.embedding`` (never from OCR
+    text) and kept up to date incrementally: new and resubmitted fingerprints
+    are upserted, and submissions deleted by any process are removed through
+    their ``IndexTombstone``.
+    """
+
+    def __init__(self, assignment_id: str, detector: CheatingDetector, embedding_model: str = DEFAULT_MODEL):
+        self.assignment_id = assignment_id
+        self.detector = detector
+        self.embedding_model = embedding_model
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        from datasketch import MinHashLSH
+        self.lsh = MinHashLSH(threshold=self.detector.exact_threshold, num_perm=self.detector.num_perm)
+        self.signatures = {}  # submission id -> packed signature
+        self.tfidf = TfidfVectorStore()
+        self.tfidf_vectors = {}  # submission id -> packed term counts
+        self.semantic = EmbeddingIndex()
+        self.embeddings = {}  # submission id -> packed float16 embedding
+        self.synced_at = None
+
+    def upsert(self, submission_id: str, signature: bytes, tfidf_vector: bytes, embedding: bytes = None):
+        """Insert or replace the fingerprints of a submission."""
+        with self.lock:
+            self._upsert(submission_id, signature, tfidf_vector, embedding)
+
+    def _upsert(self, submission_id, signature, tfidf_vector, embedding):
+        current = self.signatures.get(submission_id)
+        if current != signature:
+            if current is not None:
+                self.lsh.remove(submission_id)
+                del self.signatures[submission_id]
+            if signature:
+                self.lsh.insert(submission_id, self.detector.minhash_from_signature(signature))
+                self.signatures[submission_id] = signature
+
+        if self.tfidf_vectors.get(submission_id) != tfidf_vector:
+            self.tfidf.remove(submission_id)
+            self.tfidf_vectors.pop(submission_id, None)
+            if tfidf_vector:
+                self.tfidf.upsert(submission_id, self.tfidf.unpack(tfidf_vector))
+                self.tfidf_vectors[submission_id] = tfidf_vector
+
+        if self.embeddings.get(submission_id) != embedding:
+            self.semantic.remove(submission_id)
+            self.embeddings.pop(submission_id, None)
+            if embedding:
+                self.semantic.upsert(submission_id, unpack_embedding(embedding))
+                self.embeddings[submission_id] = embedding
+
+    def remove(self, submission_id: str):
+        """Drop a submission from the index if it is present."""
+        with self.lock:
+            self._upsert(submission_id, None, None, None)
+
+    def sync(self):
+        """Apply fingerprint changes and deletions stored in MongoDB since the last sync."""
+        if self.synced_at is not None and self.synced_at < datetime.datetime.utcnow() - TOMBSTONE_TTL + SYNC_OVERLAP:
+            logger.info(f"Rebuilding index of assignment {self.assignment_id}, last synced {self.synced_at}")
+            with self.lock:
+                self._reset()
+        if self.synced_at is None:
+            self._backfill()
+
+        query = Submission.objects(assignment=self.assignment_id)
+        if self.synced_at is not None:
+            query = query(index_updated_at__gte=self.synced_at - SYNC_OVERLAP)
+        rows = query.only('id', 'minhash_signature', 'tfidf_vector', 'embedding', 'embedding_model',
+                          'index_updated_at').as_pymongo()
+
+        deleted = []
+        if self.synced_at is not None:
+            deleted = IndexTombstone.objects(
+                assignment=self.assignment_id, deleted_at__gte=self.synced_at - SYNC_OVERLAP
+            ).scalar('submission')
+
+        with self.lock:
+            for submission_id in deleted:
+                self._upsert(str(submission_id), None, None, None)
+            latest = self.synced_at
+            for row in rows:
+                signature = row.get('minhash_signature')
+                tfidf_vector = row.get('tfidf_vector')
+                # Embeddings of another model are not comparable
+                embedding = row.get('embedding') if row.get('embedding_model') == self.embedding_model else None
+                self._upsert(
+                    str(row['_id']),
+                    bytes(signature) if signature else None,
+                    bytes(tfidf_vector) if tfidf_vector else None,
+                    bytes(embedding) if embedding else None
+                )
+                updated_at = row.get('index_updated_at')
+                if updated_at and (latest is None or updated_at > latest):
+                    latest = updated_at
+            self.synced_at = latest or datetime.datetime.utcnow()
+
+    def _backfill(self):
+        """Fingerprint submissions processed before fingerprints were stored."""
+        legacy = Submission.objects(
+            assignment=self.assignment_id,
+            ocr_text__ne=None,
+            tfidf_vector=None
+        ).only('id', 'ocr_text')
+        rows = list(legacy.as_pymongo())
+        if not rows:
+            return
+        texts = [row.get('ocr_text') or "" for row in rows]
+        signatures = self.detector.batch_signature_bytes(texts)
+        for row, text, signature in zip(rows, texts, signatures):
+            Submission.objects(id=row['_id']).update(
+                set__minhash_signature=signature,
+                set__tfidf_vector=self.tfidf.pack(self.tfidf.vectorize(text)),
+                set__index_updated_at=datetime.datetime.utcnow()
+            )
+
+    def query_minhash(self, signature: bytes, exclude: str = None) -> List[Tuple[str, float]]:
+        """
+        Find indexed submissions whose estimated Jaccard similarity reaches the
+        detector's exact-copy threshold.
+
+        Args:
+            signature (bytes): Packed signature of the submission being checked
+            exclude (str): Submission id to leave out of the results
+
+        Returns:
+            List[Tuple[str, float]]: (submission id, estimated similarity), best first
+        """
+        with self.lock:
+            candidates = self.lsh.query(self.detector.minhash_from_signature(signature))
+            scored = []
+            for candidate_id in candidates:
+                if candidate_id == exclude:
+                    continue
+                score = self.detector.signature_similarity(signature, self.signatures[candidate_id])
+                if score >= self.detector.exact_threshold:
+                    scored.append((candidate_id, score))
+
+        if scored:
+            existing = self.prune_deleted([sid for sid, _ in scored])
+            scored = [(sid, score) for sid, score in scored if sid in existing]
+
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def query_tfidf(self, tfidf_vector: bytes, exclude: str = None) -> List[Tuple[str, float]]:
+        """
+        TF-IDF cosine similarity of a submission against every other indexed one.
+
+        Args:
+            tfidf_vector (bytes): Packed term counts of the submission being checked
+            exclude (str): Submission id to leave out of the results
+
+        Returns:
+            List[Tuple[str, float]]: (submission id, similarity) per other submission
+        """
+        with self.lock:
+            return self.tfidf.query(self.tfidf.unpack(tfidf_vector), exclude=exclude)
+
+    def query_semantic(self, embedding: bytes, threshold: float, top_k: int = 10,
+                       exclude: str = None) -> List[Tuple[str, float]]:
+        """
+        Semantic near-duplicates of a submission by embedding cosine similarity.
+
+        Args:
+            embedding (bytes): Packed embedding of the submission being checked
+            threshold (float): Minimum cosine similarity of a match
+            top_k (int): Maximum number of matches
+            exclude (str): Submission id to leave out of the results
+
+        Returns:
+            List[Tuple[str, float]]: (submission id, similarity), best first
+        """
+        with self.lock:
+            matches = self.semantic.query(unpack_embedding(embedding), threshold=threshold,
+                                          top_k=top_k, exclude=exclude)
+        if matches:
+            existing = self.prune_deleted([sid for sid, _ in matches])
+            matches = [(sid, score) for sid, score in matches if sid in existing]
+        return matches
+
+    def prune_deleted(self, submission_ids: List[str]) -> Set[str]:
+        """
+        Drop submissions that no longer exist from the index.
+
+        Deletions normally arrive through tombstones on the next ``sync``; this
+        catches any reported id deleted since, so callers run it on the (few)
+        ids they are about to report.
+
+        Returns:
+            Set[str]: The ids that still exist
+        """
+        existing = {str(pk) for pk in Submission.objects(id__in=list(submission_ids)).scalar('id')}
+        for sid in submission_ids:
+            if sid not in existing:
+                self.remove(sid)
+        return existing
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+class AssignmentIndexRegistry:
+    """Per-process map of assignment id -> AssignmentIndex."""
+
+    def __init__(self):
+        self.detector = CheatingDetector()
+        self._indexes: Dict[str, AssignmentIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, assignment_id) -> AssignmentIndex:
+        """Return the synced index for an assignment, building it on first use."""
+        assignment_id = str(assignment_id)
+        with self._lock:
+            index = self._indexes.get(assignment_id)
+            if index is None:
+                index = AssignmentIndex(assignment_id, self.detector)
+                self._indexes[assignment_id] = index
+        index.sync()
+        return index
+
+
+# Create a global instance
+assignment_indexes = AssignmentIndexRegistry()
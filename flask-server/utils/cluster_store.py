@@ -0,0 +1,98 @@
+import datetime
+import logging
+from typing import Dict, List
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from models.plagiarism_cluster import AssignmentClusters
+from ml_models.copy_clusters import build_clusters
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ClusterStore:
+    """
+    Per-assignment plagiarism edges and the copy-ring clusters built from them.
+
+    Edges are kept in one document per assignment so the professor view loads
+    every cluster with a single query. Each submission owns the edges found when
+    it was checked; replacing them bumps ``edges_version`` and the clusters are
+    rebuilt and saved only if no other writer changed the edges meanwhile.
+    """
+
+    def get(self, assignment_id):
+        return AssignmentClusters.objects(assignment=assignment_id).first()
+
+    def set_submission_edges(self, assignment_id, submission_id, edges: List[Dict]):
+        """
+        Replace every edge touching a submission with ``edges`` and rebuild the clusters.
+
+        Args:
+            assignment_id: Assignment of the submission
+            submission_id: Submission whose edges are replaced
+            edges (List[Dict]): New edges, each with 'submission_ids', 'type' and 'similarity_score'
+        """
+        # $pull and $push cannot touch the same field in one update
+        self._update(assignment_id, {
+            '$pull': {'edges': {'submission_ids': str(submission_id)}},
+            '$inc': {'edges_version': 1},
+            '$set': {'updated_at': datetime.datetime.utcnow()}
+        })
+        if edges:
+            self._update(assignment_id, {
+                '$push': {'edges': {'$each': [self._edge(edge) for edge in edges]}},
+                '$inc': {'edges_version': 1}
+            })
+        self.rebuild(assignment_id)
+
+    def remove_submission(self, assignment_id, submission_id):
+        """Drop a deleted or resubmitted submission from the clusters."""
+        self.set_submission_edges(assignment_id, submission_id, [])
+
+    def replace_edges(self, assignment_id, edges: List[Dict]):
+        """Replace all edges of an assignment, e.g. after an assignment-wide analysis."""
+        self._update(assignment_id, {
+            '$set': {'edges': [self._edge(edge) for edge in edges], 'updated_at': datetime.datetime.utcnow()},
+            '$inc': {'edges_version': 1}
+        })
+        self.rebuild(assignment_id)
+
+    def rebuild(self, assignment_id):
+        """Rebuild the clusters from the current edges unless a newer writer got there first."""
+        document = AssignmentClusters._get_collection().find_one(
+            {'assignment': ObjectId(str(assignment_id))}, {'edges': 1, 'edges_version': 1}
+        )
+        if document is None:
+            return
+        clusters = build_clusters(document.get('edges', []))
+        version = document.get('edges_version', 0)
+        updated = AssignmentClusters.objects(assignment=assignment_id, edges_version=version).update(
+            set__clusters=clusters,
+            set__clusters_version=version,
+            set__updated_at=datetime.datetime.utcnow()
+        )
+        if not updated:
+            logger.info(f"Edges of assignment {assignment_id} changed during rebuild, leaving it to the newer writer")
+
+    @staticmethod
+    def _update(assignment_id, update):
+        query = {'assignment': ObjectId(str(assignment_id))}
+        collection = AssignmentClusters._get_collection()
+        try:
+            collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent upsert created the document first
+            collection.update_one(query, update)
+
+    @staticmethod
+    def _edge(edge):
+        return {
+            'submission_ids': sorted(str(sid) for sid in edge['submission_ids']),
+            'type': edge['type'],
+            'similarity_score': float(edge['similarity_score'])
+        }
+
+
+# Create a global instance
+cluster_store = ClusterStore()
@@ -1,32 +1,116 @@
 import os
 import io
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 import threading
+import datetime
+import time
+import hashlib
+from config import Config
 from models.submission import Submission
+from models.assignment import Assignment
 from ml_models.ocr_processor import OCRProcessor
-import tempfile
-from ml_models.similarity_checker import SimilarityChecker
-from ml_models.cheating_detector import CheatingDetector
+from ml_models.similarity_checker import SimilarityChecker, DEFAULT_CHUNK_WORDS, DEFAULT_CHUNK_OVERLAP, DEFAULT_POOLING
+from ml_models.model_registry import DEFAULT_MODEL, model_registry
+from ml_models import winnowing
+from ml_models.ann_index import pack_embedding, pack_embeddings, unpack_embeddings
+from utils.assignment_index import assignment_indexes
+from utils.cluster_store import cluster_store
+from utils.fingerprint_corpus import fingerprint_corpus
+from utils.job_queue import job_queue
+from utils.ocr_cache import ocr_cache
+from utils.plagiarism_flags import plagiarism_flags, plagiarism_result
+from utils.scoring import compute_final_score
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _text_hash(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
 class DocumentProcessor:
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english')
         self.ocr = OCRProcessor()  # Assumes env vars for credentials/processor
+        self.similarity_model_name = DEFAULT_MODEL
+        # Window embeddings are only comparable with the same model and chunking
+        self.embedding_key = f"{model_registry.model_version(DEFAULT_MODEL)}:{DEFAULT_CHUNK_WORDS}:{DEFAULT_CHUNK_OVERLAP}"
+        self._similarity_checker = None
+        self._checker_lock = threading.Lock()
+
+    @property
+    def similarity_checker(self):
+        """Shared SimilarityChecker, created on first use and reused by every thread."""
+        if self._similarity_checker is None:
+            with self._checker_lock:
+                if self._similarity_checker is None:
+                    self._similarity_checker = SimilarityChecker(self.similarity_model_name)
+        return self._similarity_checker
     
     def process_submission_async(self, submission_id):
-        """Start asynchronous processing of a submission"""
-        thread = threading.Thread(target=self._process_submission, args=(submission_id,))
-        thread.start()
+        """Queue a submission for processing by the worker pool (see worker.py)"""
+        return job_queue.enqueue('process_submission', submission_id)
     
-    def _process_submission(self, submission_id):
-        """Process a submission with text extraction and plagiarism checking"""
+    def process_model_answer(self, assignment_id, raise_errors=False):
+        """
+        Extract and encode an assignment's model answer.
+
+        Runs in the worker so the web request that created the assignment never
+        runs OCR. Submissions already processed without the model answer are
+        queued again; only their correctness stage re-runs.
+
+        With ``raise_errors`` the error is re-raised after the assignment is
+        marked Failed, so the job queue can retry it.
+        """
+        assignment = Assignment.objects(id=assignment_id).first()
+        if not assignment or not assignment.model_answer_file:
+            logger.error(f"Assignment {assignment_id} not found or has no model answer file")
+            return
+        try:
+            Assignment.objects(id=assignment.id).update(set__model_answer_status='Processing')
+            # Streamed from GridFS into the OCR spool (served from the OCR cache when seen before)
+            model_answer_text, _ = self._extract_text_from_pdf(assignment.model_answer_file.get())
+            fields = self.embed_model_answer(model_answer_text)
+            Assignment.objects(id=assignment.id).update(
+                set__model_answer_text=model_answer_text,
+                set__model_answer_status='Completed',
+                unset__model_answer_error=True,
+                **{f"set__{name}": value for name, value in fields.items()}
+            )
+            logger.info(f"Extracted model answer of assignment {assignment_id}")
+        except Exception as e:
+            logger.error(f"Error extracting model answer of assignment {assignment_id}: {str(e)}")
+            Assignment.objects(id=assignment.id).update(
+                set__model_answer_status='Failed',
+                set__model_answer_error=str(e)
+            )
+            if raise_errors:
+                raise
+            return
+
+        requeued = 0
+        for submission_id in Submission.objects(assignment=assignment.id, processing_status='Completed').scalar('id'):
+            try:
+                self.process_submission_async(submission_id)
+                requeued += 1
+            except Exception as e:
+                logger.warning(f"Could not re-queue submission {submission_id} for its correctness score: {str(e)}")
+                break
+        if requeued:
+            logger.info(f"Re-queued {requeued} submissions of assignment {assignment_id} for the model answer")
+
+    def _process_submission(self, submission_id, raise_errors=False, force=False):
+        """Process a submission with text extraction and plagiarism checking.
+
+        The pipeline runs as stages (extract -> correctness -> plagiarism ->
+        scoring). Each stage stores a key of its inputs in
+        ``submission.stage_keys`` and is skipped when the key is unchanged, so
+        only stages downstream of what changed are re-run. ``force`` re-runs
+        every stage.
+
+        With ``raise_errors`` the error is re-raised after the submission is
+        marked Failed, so the job queue can retry it.
+        """
         try:
             # Get the submission
             submission = Submission.objects(id=submission_id).first()
@@ -37,40 +121,47 @@ class DocumentProcessor:
             # Update status to Processing
             submission.processing_status = 'Processing'
             submission.save()
-            
-            # Extract text from PDF
-            pdf_data = submission.answer_file.read()
-            extracted_text = self._extract_text_from_pdf(pdf_data)
-            submission.ocr_text = extracted_text
 
-            # Correctness analysis: compare to model answer
+            stage_keys = dict(submission.stage_keys or {})
             assignment = submission.assignment
-            model_answer_text = assignment.model_answer_text if hasattr(assignment, 'model_answer_text') else None
-            if model_answer_text:
-                checker = SimilarityChecker()
-                correctness_result = checker.check_answer_correctness(extracted_text, model_answer_text)
-                submission.correctness_score = float(correctness_result['similarity_score']) * 100
-                submission.correctness_label = correctness_result['correctness']
-            else:
-                submission.correctness_score = None
-                submission.correctness_label = None
-            
-            # Check for plagiarism
-            plagiarism_result, plagiarism_details = self._check_plagiarism(submission)
-            submission.plagiarism_result = plagiarism_result
-            submission.plagiarism_details = plagiarism_details
-            
-            # Plagiarism severity and penalty
-            severity = getattr(submission, 'plagiarism_severity', None) or 'medium'  # default to medium
-            penalty_map = {'easy': 0.10, 'medium': 0.25, 'hard': 0.50}
-            penalty = penalty_map.get(severity, 0.25)
-            if plagiarism_result == 'found' and submission.correctness_score is not None:
-                submission.final_score = round(submission.correctness_score * (1 - penalty), 2)
-            else:
-                submission.final_score = submission.correctness_score
+            model_answer_text = getattr(assignment, 'model_answer_text', None)
+
+            # Extract text from PDF: depends on the stored file and the OCR engine
+            extract_key = f"{submission.answer_file.grid_id}:{self.ocr.engine_version()}"
+            text_changed = self._run_stage(submission, stage_keys, 'extract', extract_key, force,
+                                           lambda: self._stage_extract(submission))
+
+            # Sentence embedding: depends on the text and the model
+            text_hash = _text_hash(submission.ocr_text)
+            embedded = self._run_stage(submission, stage_keys, 'embed', f"{text_hash}:{self.embedding_key}",
+                                       force or text_changed, lambda: self._stage_embed(submission))
+
+            # Correctness analysis: depends on the embeddings, the model answer and the pooling
+            correctness_key = f"{text_hash}:{_text_hash(model_answer_text)}:{self.embedding_key}:{DEFAULT_POOLING}"
+            self._run_stage(submission, stage_keys, 'correctness', correctness_key, force or embedded,
+                            lambda: self._stage_correctness(submission, assignment, model_answer_text))
+
+            # Pre-screen for plagiarism: depends on the text. The full check is
+            # the assignment-wide analysis (utils/assignment_analysis.py)
+            if Config.PLAGIARISM_PRESCREEN:
+                self._run_stage(submission, stage_keys, 'plagiarism', text_hash, force or text_changed,
+                                lambda: self._stage_plagiarism(submission))
+
+            # Positional fingerprints for matched-passage evidence: depends on the text
+            self._run_stage(submission, stage_keys, 'winnow', text_hash, force or text_changed,
+                            lambda: self._stage_winnow(submission))
+
+            # Reuse of submissions from other assignments and semesters: depends on the text
+            self._run_stage(submission, stage_keys, 'reuse', text_hash, force or text_changed,
+                            lambda: self._stage_reuse(submission))
+
+            # Plagiarism severity and penalty: cheap, always recomputed
+            self.recompute_score(submission)
             
             # Update status to Completed
+            submission.stage_keys = stage_keys
             submission.processing_status = 'Completed'
+            submission.processing_error = None
             submission.save()
             
             logger.info(f"Successfully processed submission {submission_id}")
@@ -83,86 +174,284 @@ class DocumentProcessor:
                 submission.save()
             except Exception as save_error:
                 logger.error(f"Error updating submission status: {str(save_error)}")
+            if raise_errors:
+                raise
     
-    def _extract_text_from_pdf(self, pdf_data):
-        """Extract text from PDF using Google Cloud Document AI"""
+    @staticmethod
+    def _run_stage(submission, stage_keys, name, key, force, run):
+        """Run a stage unless its input key is unchanged. Returns whether it ran."""
+        if not force and stage_keys.get(name) == key:
+            logger.info(f"Submission {submission.id}: {name} stage unchanged, reusing stored result")
+            return False
+        run()
+        stage_keys[name] = key
+        return True
+
+    def _stage_extract(self, submission):
+        # Streamed from GridFS into the OCR spool, never held as one bytes object
+        extracted_text, ocr_details = self._extract_text_from_pdf(submission.answer_file.get())
+        submission.ocr_text = extracted_text
+        submission.ocr_details = ocr_details
+        submission.file_sha256 = ocr_details['sha256']
+
+    def _stage_embed(self, submission):
+        # One batched encode of every window; the pooled embedding feeds the semantic index
+        chunks = self.similarity_checker.embed_chunks([submission.ocr_text or ""])[0]
+        submission.embedding_chunks = pack_embeddings(chunks)
+        submission.embedding = pack_embedding(self.similarity_checker.pool(chunks))
+        submission.embedding_model = self.similarity_model_name
+        submission.index_updated_at = datetime.datetime.utcnow()
+
+    def embed_model_answer(self, model_answer_text):
+        """
+        Encode a model answer into the Assignment fields that persist its embeddings.
+
+        Returns:
+            dict: model_answer_chunks, model_answer_embedding_key and model_answer_text_hash
+        """
+        chunks = self.similarity_checker.embed_chunks([model_answer_text or ""])[0]
+        return {
+            'model_answer_chunks': pack_embeddings(chunks),
+            'model_answer_embedding_key': self.embedding_key,
+            'model_answer_text_hash': _text_hash(model_answer_text)
+        }
+
+    def model_answer_chunks(self, assignment):
+        """
+        Window embeddings of an assignment's model answer.
+
+        Served from the assignment; re-encoded and persisted only when the model
+        answer text, the model or its version changed since they were stored.
+        """
+        if (assignment.model_answer_chunks
+                and assignment.model_answer_embedding_key == self.embedding_key
+                and assignment.model_answer_text_hash == _text_hash(assignment.model_answer_text)):
+            return unpack_embeddings(assignment.model_answer_chunks)
+
+        logger.info(f"Encoding model answer of assignment {assignment.id}")
+        fields = self.embed_model_answer(assignment.model_answer_text)
+        Assignment.objects(id=assignment.id).update(**{f"set__{name}": value for name, value in fields.items()})
+        for name, value in fields.items():
+            setattr(assignment, name, value)
+        return unpack_embeddings(fields['model_answer_chunks'])
+
+    def _stage_correctness(self, submission, assignment, model_answer_text):
+        # Correctness analysis: compare to model answer
+        if model_answer_text:
+            correct_chunks = self.model_answer_chunks(assignment)
+            correctness_result = self.similarity_checker.check_answer_correctness(
+                submission.ocr_text,
+                model_answer_text,
+                student_chunks=unpack_embeddings(submission.embedding_chunks) if submission.embedding_chunks else None,
+                correct_chunks=correct_chunks
+            )
+            submission.correctness_score = float(correctness_result['similarity_score']) * 100
+            submission.correctness_label = correctness_result['correctness']
+        else:
+            submission.correctness_score = None
+            submission.correctness_label = None
+
+    def _stage_plagiarism(self, submission):
+        plagiarism_result, plagiarism_details = self._check_plagiarism(submission)
+        previous = submission.plagiarism_details or {}
+        if 'cross_assignment' in previous:
+            plagiarism_details['cross_assignment'] = previous['cross_assignment']
+        plagiarism_details['prescreen_found'] = plagiarism_result == 'found'
+        submission.plagiarism_details = plagiarism_details
+        submission.plagiarism_result = plagiarism_result(plagiarism_details)
+
+    def _stage_winnow(self, submission):
+        submission.winnow_fingerprints = winnowing.pack(winnowing.fingerprint(submission.ocr_text or ""))
+
+    def _stage_reuse(self, submission):
+        signature = assignment_indexes.detector.signature_bytes(submission.ocr_text or "")
+        matches = fingerprint_corpus.query(submission, signature)
+        fingerprint_corpus.add(submission, signature)
+
+        details = dict(submission.plagiarism_details or {})
+        details['cross_assignment'] = {
+            'found': bool(matches),
+            'scope': fingerprint_corpus.scope,
+            'window_days': fingerprint_corpus.window_days,
+            'matches': matches
+        }
+        submission.plagiarism_details = details
+        submission.plagiarism_result = plagiarism_result(details)
+
+    @staticmethod
+    def recompute_score(submission):
+        """Recompute final_score from the stored correctness and plagiarism results (no I/O)."""
+        submission.final_score = compute_final_score(
+            submission.correctness_score,
+            submission.plagiarism_result,
+            submission.plagiarism_severity
+        )
+        return submission.final_score
+
+    def _extract_text_from_pdf(self, pdf):
+        """
+        Extract text from PDF via the OCR cache, its text layer or page-parallel OCR. Returns (text, details).
+
+        ``pdf`` is the PDF's bytes or a binary stream (GridFS file, upload). It is
+        spooled into memory once (see ``OCRProcessor.spool``), hashed on the way
+        for the cache lookup, and released when extraction ends or fails.
+        """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                tmp_file.write(pdf_data)
-                tmp_file_path = tmp_file.name
-            try:
-                text = self.ocr.extract_text_from_pdf(tmp_file_path)
-            finally:
-                os.remove(tmp_file_path)
-            return text
+            with self.ocr.spool(pdf) as spooled:
+                sha256 = spooled.sha256
+                engine_version = self.ocr.engine_version()
+                cached = ocr_cache.get(sha256, engine_version)
+                if cached is not None:
+                    text, details = cached
+                    details.update({'sha256': sha256, 'cache_hit': True})
+                    logger.info(f"OCR cache hit for {sha256}")
+                    return text, details
+
+                started = time.perf_counter()
+                pages = self.ocr.extract_pages(spooled.path)
+                text = self.ocr.join_pages(pages)
+            details = {
+                'pages': self.ocr.page_stats(pages),
+                'methods': self.ocr.method_counts(pages),
+                'seconds': round(time.perf_counter() - started, 3),
+                'partial': any(page['error'] for page in pages)
+            }
+            logger.info(f"Extracted {len(pages)} pages in {details['seconds']}s ({details['methods']})")
+            # Only a complete, error-free transcript may be served again for this
+            # content hash; pages that failed (possibly transiently) or were cut
+            # by a budget in partial mode are retried next time
+            if not details['partial'] and all(page['error'] is None for page in pages):
+                ocr_cache.put(sha256, engine_version, text, details)
+            details.update({'sha256': sha256, 'cache_hit': False})
+            return text, details
         except Exception as e:
             logger.error(f"Error in PDF text extraction: {str(e)}")
             raise
     
     def _check_plagiarism(self, submission):
-        """Check for plagiarism against other submissions using MinHash+LSH and TF-IDF/cosine similarity. Returns 'found' or 'not found'. Also flags previous matching submissions."""
+        """Check for plagiarism against other submissions using MinHash+LSH and TF-IDF/cosine similarity. Returns 'found' or 'not found'. Also records the match on the matching submissions."""
         try:
-            # Get all other submissions for the same assignment
-            other_submissions = Submission.objects(
-                assignment=submission.assignment,
-                id__ne=submission.id,
-                ocr_text__exists=True
-            )
-            if not other_submissions:
-                return 'not found', {"message": "No other submissions to compare against"}
-
-            # Prepare data for CheatingDetector
             current_text = submission.ocr_text or ""
-            submissions_list = [
-                {"id": str(s.id), "text": s.ocr_text or ""} for s in other_submissions
-            ]
-            # Add the current submission as the last item
-            submissions_list.append({"id": str(submission.id), "text": current_text})
+            submission_id = str(submission.id)
+
+            # Fingerprint this submission once and store the fingerprints, then
+            # query the assignment's persistent indexes with them
+            detector = assignment_indexes.detector
+            signature = detector.signature_bytes(current_text)
+            index = assignment_indexes.get(submission.assignment.id)
+            tfidf_vector = index.tfidf.pack(index.tfidf.vectorize(current_text))
+            submission.minhash_signature = signature
+            submission.tfidf_vector = tfidf_vector
+            submission.index_updated_at = datetime.datetime.utcnow()
 
-            detector = CheatingDetector()
-            exact_copies = detector.detect_exact_copies(submissions_list)
+            minhash_matches = index.query_minhash(signature, exclude=submission_id)
+            similarity_scores = index.query_tfidf(tfidf_vector, exclude=submission_id)
+
+            # Embedding nearest neighbours catch synonym-level rewrites TF-IDF misses
+            semantic_threshold = Config.PLAGIARISM_SEMANTIC_THRESHOLD
+            embedding = submission.embedding if submission.embedding_model == index.embedding_model else None
+            semantic_matches = index.query_semantic(
+                embedding, semantic_threshold, exclude=submission_id) if embedding else []
+            index.upsert(submission_id, signature, tfidf_vector, embedding)
+
+            # Byte-identical files are exact copies regardless of OCR output
+            identical_ids = []
+            if submission.file_sha256:
+                identical_ids = [str(pk) for pk in Submission.objects(
+                    assignment=submission.assignment,
+                    file_sha256=submission.file_sha256,
+                    id__ne=submission.id
+                ).scalar('id')]
+
+            if not similarity_scores and not identical_ids and not semantic_matches:
+                cluster_store.remove_submission(submission.assignment.id, submission_id)
+                plagiarism_flags.remove_submission(submission.assignment.id, submission_id)
+                return 'not found', {"message": "No other submissions to compare against"}
 
             # MinHash+LSH result
-            flagged = [case for case in exact_copies if str(submission.id) in case['submission_ids']]
-            minhash_found = bool(flagged)
+            minhash_found = bool(minhash_matches)
+            flagged = [{
+                'type': 'exact_copy',
+                'submission_ids': [submission_id] + [sid for sid, _ in minhash_matches],
+                'similarity_score': minhash_matches[0][1],
+                'matches': [
+                    {"submission_id": sid, "similarity_score": score}
+                    for sid, score in minhash_matches
+                ]
+            }] if minhash_found else []
 
             # TF-IDF/cosine similarity
-            texts = [s["text"] for s in submissions_list]
-            tfidf_matrix = self.vectorizer.fit_transform(texts)
-            similarity_scores = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])[0]
-            max_similarity = max(similarity_scores) if len(similarity_scores) > 0 else 0
             tfidf_threshold = 0.7  # 70% similarity
-            tfidf_found = max_similarity >= tfidf_threshold
+            tfidf_flagged = [sid for sid, score in similarity_scores if score >= tfidf_threshold]
+            if tfidf_flagged:
+                existing = index.prune_deleted(tfidf_flagged)
+                tfidf_flagged = [sid for sid in tfidf_flagged if sid in existing]
+                similarity_scores = [
+                    (sid, score) for sid, score in similarity_scores
+                    if score < tfidf_threshold or sid in existing
+                ]
+            max_similarity = max((score for _, score in similarity_scores), default=0)
+            tfidf_found = bool(tfidf_flagged)
             tfidf_details = {
                 "max_similarity": float(max_similarity),
                 "threshold": tfidf_threshold,
                 "comparisons": [
                     {
-                        "submission_id": submissions_list[i]["id"],
+                        "submission_id": sid,
                         "similarity_score": float(score)
                     }
-                    for i, score in enumerate(similarity_scores)
+                    for sid, score in similarity_scores
                 ]
             }
 
+            semantic_details = {
+                "threshold": semantic_threshold,
+                "max_similarity": max((score for _, score in semantic_matches), default=0.0),
+                "matches": [
+                    {"submission_id": sid, "similarity_score": score}
+                    for sid, score in semantic_matches
+                ]
+            } if embedding else {"message": "No embedding available for semantic comparison."}
+
             # Combine results
             details = {
                 "minhash_lsh": flagged[0] if minhash_found else {"message": "No exact copy detected by MinHash+LSH."},
-                "tfidf": tfidf_details
+                "tfidf": tfidf_details,
+                "semantic": semantic_details
             }
-            # Decision and flagging
-            if minhash_found or tfidf_found:
-                # Also flag previous matching submissions
-                if minhash_found:
-                    for sid in flagged[0]['submission_ids']:
-                        if sid != str(submission.id):
-                            Submission.objects(id=sid).update(set__plagiarism_result='found')
-                if tfidf_found:
-                    for i, score in enumerate(similarity_scores):
-                        if score >= tfidf_threshold:
-                            sid = submissions_list[i]['id']
-                            if sid != str(submission.id):
-                                Submission.objects(id=sid).update(set__plagiarism_result='found')
+            if identical_ids:
+                details["identical_file"] = {
+                    "type": "identical_file",
+                    "submission_ids": [submission_id] + identical_ids,
+                    "similarity_score": 1.0,
+                    "sha256": submission.file_sha256
+                }
+            # Keep the assignment's copy-ring clusters in step with this submission's matches
+            edges = [
+                {'type': 'exact_copy', 'submission_ids': [submission_id, sid], 'similarity_score': score}
+                for sid, score in minhash_matches
+            ] + [
+                {'type': 'paraphrase', 'submission_ids': [submission_id, sid], 'similarity_score': score}
+                for sid, score in similarity_scores if sid in tfidf_flagged
+            ] + [
+                {'type': 'semantic', 'submission_ids': [submission_id, sid], 'similarity_score': score}
+                for sid, score in semantic_matches
+            ] + [
+                {'type': 'identical_file', 'submission_ids': [submission_id, sid], 'similarity_score': 1.0}
+                for sid in identical_ids
+            ]
+            cluster_store.set_submission_edges(submission.assignment.id, submission_id, edges)
+
+            # Record the matches on the matching submissions, whose result and
+            # score are derived again from their evidence
+            matches = {}
+            for edge in edges:
+                match = matches.setdefault(edge['submission_ids'][1], {'types': [], 'similarity_score': 0.0})
+                match['types'].append(edge['type'])
+                match['similarity_score'] = max(match['similarity_score'], float(edge['similarity_score']))
+            plagiarism_flags.set_matches(submission.assignment.id, submission_id, matches)
+
+            if minhash_found or tfidf_found or identical_ids or semantic_matches:
                 return 'found', details
             else:
                 return 'not found', details
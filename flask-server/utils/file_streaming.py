@@ -0,0 +1,109 @@
+import datetime
+import unicodedata
+from urllib.parse import quote
+from flask import request, Response
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+# Read size when streaming; GridFS stores files in 255 KiB chunks
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def _stream(grid_out, start, end, chunk_size):
+    """Yield bytes [start, end) of a GridFS file one chunk at a time."""
+    try:
+        grid_out.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = grid_out.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        grid_out.close()
+
+
+def _disposition_options(download_name):
+    """Content-Disposition filename options, with an RFC 5987 variant for non-ASCII names."""
+    try:
+        download_name.encode('ascii')
+        return {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='')}"}
+
+
+def _range_applies(etag, last_modified):
+    """False when an If-Range header names a different version of the file."""
+    if_range = request.if_range
+    if if_range.etag:
+        return if_range.etag == etag
+    if if_range.date:
+        return if_range.date == last_modified
+    return True
+
+
+def send_gridfs_file(file_proxy, mimetype=None, as_attachment=False, download_name=None,
+                     max_age=0, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream a GridFS file to the client without loading it into memory.
+
+    Chunks are read from GridFS as the response is sent. Single-range
+    ``Range`` requests get ``206 Partial Content``. ``ETag`` comes from the
+    GridFS md5 (or file id and length) and ``Last-Modified`` from its upload
+    date, so ``If-None-Match`` / ``If-Modified-Since`` are answered with
+    ``304 Not Modified``.
+
+    Args:
+        file_proxy (GridFSProxy): A mongoengine FileField value
+        mimetype (str): Content type, defaults to the one stored with the file
+        as_attachment (bool): Send ``Content-Disposition: attachment``
+        download_name (str): File name offered to the client
+        max_age (int): Seconds clients may reuse the file without revalidating
+        chunk_size (int): Bytes read from GridFS per iteration
+
+    Returns:
+        Response: Streaming response
+    """
+    # A fresh GridOut per request, so concurrent downloads never share a read position
+    grid_out = file_proxy.fs.get(file_proxy.grid_id)
+    length = grid_out.length
+    etag = getattr(grid_out, 'md5', None) or f"{grid_out._id}-{length}"
+    last_modified = grid_out.upload_date.replace(microsecond=0)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+
+    response = Response(mimetype=mimetype or grid_out.content_type or 'application/octet-stream')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.accept_ranges = 'bytes'
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if download_name:
+        disposition = 'attachment' if as_attachment else 'inline'
+        response.headers.set('Content-Disposition', disposition, **_disposition_options(download_name))
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        grid_out.close()
+        response.status_code = 304
+        return response
+
+    start, end = 0, length
+    requested = request.range
+    if requested is not None and len(requested.ranges) == 1 and _range_applies(etag, last_modified):
+        bounds = requested.range_for_length(length)
+        if bounds is None:
+            grid_out.close()
+            response.status_code = 416
+            response.headers['Content-Range'] = f"bytes */{length}"
+            return response
+        start, end = bounds
+        response.status_code = 206
+        response.content_range = ContentRange('bytes', start, end, length)
+
+    response.response = _stream(grid_out, start, end, chunk_size)
+    response.content_length = end - start
+    # Iterated chunk by chunk by the server instead of being buffered by Werkzeug
+    response.direct_passthrough = True
+    return response
@@ -0,0 +1,174 @@
+"""
+Global fingerprint corpus for reuse detection across assignments and semesters.
+
+Every processed submission stores its MinHash signature split into LSH band
+hashes. A lookup is one indexed ``$in`` query on the band hashes, scoped by
+course and time window, followed by a signature comparison of the candidates,
+so its cost depends on the number of near matches rather than the corpus size.
+Historic submissions are added with:
+
+    python -m utils.fingerprint_corpus
+"""
+import datetime
+import hashlib
+import logging
+from typing import Dict, List
+import numpy as np
+from models.fingerprint import SubmissionFingerprint
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 32 bands of 4 rows over 128 permutations: a pair with Jaccard 0.5 shares at
+# least one band with probability ~0.87, one with Jaccard 0.2 with ~0.05
+DEFAULT_BANDS = 32
+
+
+class FingerprintCorpus:
+    def __init__(self, bands=None, threshold=0.5, scope=None, window_days=None, max_candidates=None):
+        """
+        Args:
+            bands (int): Number of LSH bands the signature is split into
+            threshold (float): Minimum estimated Jaccard similarity of a reported match
+            scope (str): 'course' to search the same course only, 'global' for all courses
+            window_days (int): Only match submissions this many days around the submission (0 = all)
+            max_candidates (int): Upper bound on candidates verified per lookup
+        """
+        self.bands = bands or DEFAULT_BANDS
+        self.threshold = threshold
+        self.scope = scope or Config.FINGERPRINT_SCOPE
+        self.window_days = Config.FINGERPRINT_WINDOW_DAYS if window_days is None else window_days
+        self.max_candidates = max_candidates or Config.FINGERPRINT_MAX_CANDIDATES
+
+    def band_hashes(self, signature: bytes) -> List[int]:
+        """Hash each band of a packed signature to a signed 64-bit integer."""
+        values = np.frombuffer(signature, dtype='<u4')
+        if len(values) == 0 or len(values) % self.bands:
+            raise ValueError(f"Signature of {len(values)} values cannot be split into {self.bands} bands")
+        rows = np.split(values, self.bands)
+        return [
+            # The band number is hashed in so equal rows in different bands never match
+            int.from_bytes(hashlib.blake2b(bytes([band]) + row.tobytes(), digest_size=8).digest(),
+                           'little', signed=True)
+            for band, row in enumerate(rows)
+        ]
+
+    def add(self, submission, signature: bytes):
+        """Insert or replace the fingerprint of a submission."""
+        self._upsert(submission.id, submission.assignment.id, submission.student.id,
+                     submission.assignment.course, submission.submitted_at, signature)
+
+    def _upsert(self, submission_id, assignment_id, student_id, course, submitted_at, signature):
+        SubmissionFingerprint.objects(submission=submission_id).update_one(
+            upsert=True,
+            set__assignment=assignment_id,
+            set__student=student_id,
+            set__course=course,
+            set__submitted_at=submitted_at,
+            set__signature=signature,
+            set__bands=self.band_hashes(signature)
+        )
+
+    def remove(self, submission_id):
+        SubmissionFingerprint.objects(submission=submission_id).delete()
+
+    def query(self, submission, signature: bytes) -> List[Dict]:
+        """
+        Find fingerprinted submissions of other assignments that reuse this text.
+
+        Args:
+            submission (Submission): Submission being checked, used for scoping
+            signature (bytes): Its packed MinHash signature
+
+        Returns:
+            List[Dict]: Matches with submission, assignment, student, course,
+            submission time and estimated similarity, best first
+        """
+        filters = {
+            'bands__in': self.band_hashes(signature),
+            'assignment__ne': submission.assignment.id
+        }
+        if self.scope == 'course':
+            filters['course'] = submission.assignment.course
+        if self.window_days:
+            anchor = submission.submitted_at or datetime.datetime.utcnow()
+            window = datetime.timedelta(days=self.window_days)
+            filters['submitted_at__gte'] = anchor - window
+            filters['submitted_at__lte'] = anchor + window
+
+        candidates = SubmissionFingerprint.objects(**filters).only(
+            'submission', 'assignment', 'student', 'course', 'submitted_at', 'signature'
+        ).limit(self.max_candidates).as_pymongo()
+
+        mine = np.frombuffer(signature, dtype='<u4')
+        matches = []
+        for row in candidates:
+            theirs = np.frombuffer(bytes(row['signature']), dtype='<u4')
+            if len(theirs) != len(mine):
+                continue
+            similarity = float(np.count_nonzero(theirs == mine)) / len(mine)
+            if similarity < self.threshold:
+                continue
+            matches.append({
+                'submission_id': str(row['submission']),
+                'assignment_id': str(row['assignment']),
+                'student_id': str(row['student']) if row.get('student') else None,
+                'same_student': row.get('student') == submission.student.id,
+                'course': row['course'],
+                'submitted_at': row['submitted_at'].isoformat() if row.get('submitted_at') else None,
+                'similarity_score': similarity
+            })
+        matches.sort(key=lambda match: -match['similarity_score'])
+        return matches
+
+    def backfill(self, batch_size=500):
+        """Fingerprint processed submissions that are not in the corpus yet."""
+        from models.assignment import Assignment
+        from models.submission import Submission
+        from utils.assignment_index import assignment_indexes
+
+        detector = assignment_indexes.detector
+        courses = {}
+        added = 0
+        last_id = None
+        while True:
+            query = Submission.objects(ocr_text__ne=None)
+            if last_id is not None:
+                query = query(id__gt=last_id)
+            batch = list(query.order_by('id').limit(batch_size).only(
+                'id', 'assignment', 'student', 'submitted_at', 'ocr_text').as_pymongo())
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+
+            known = set(SubmissionFingerprint.objects(
+                submission__in=[row['_id'] for row in batch]).distinct('submission'))
+            missing = [row for row in batch if row['_id'] not in known]
+            unknown_courses = {row['assignment'] for row in missing} - set(courses)
+            if unknown_courses:
+                courses.update(Assignment.objects(id__in=list(unknown_courses)).scalar('id', 'course'))
+            # Submissions of deleted assignments have no course to scope by
+            missing = [row for row in missing if row['assignment'] in courses]
+
+            signatures = detector.batch_signature_bytes([row.get('ocr_text') or "" for row in missing])
+            for row, signature in zip(missing, signatures):
+                self._upsert(row['_id'], row['assignment'], row.get('student'),
+                             courses[row['assignment']], row.get('submitted_at'), signature)
+            added += len(missing)
+            logger.info(f"Fingerprinted {added} historic submissions")
+        return added
+
+
+# Create a global instance
+fingerprint_corpus = FingerprintCorpus()
+
+
+if __name__ == '__main__':
+    import os
+    from dotenv import load_dotenv
+    load_dotenv()
+    from utils.mongo import connect_mongo
+    connect_mongo(os.getenv('FLASK_ENV') == 'production')
+    fingerprint_corpus.backfill()
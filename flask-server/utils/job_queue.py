@@ -0,0 +1,147 @@
+import datetime
+import logging
+from mongoengine.errors import NotUniqueError
+from mongoengine.queryset.visitor import Q
+from pymongo.errors import DuplicateKeyError
+from models.job import ProcessingJob
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['queued', 'running']
+
+
+class QueueFullError(Exception):
+    """Raised when the number of pending jobs reaches JOB_QUEUE_MAX_PENDING."""
+
+
+class JobQueue:
+    """
+    MongoDB-backed job queue with lease semantics.
+
+    A worker claims a job atomically and holds a lease on it; the lease is
+    renewed while the job runs. If the worker dies, the lease expires and the
+    job becomes claimable again. Failed jobs are retried with exponential
+    backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, lease_seconds=None, max_attempts=None, max_pending=None):
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        self.max_pending = max_pending or Config.JOB_QUEUE_MAX_PENDING
+
+    def pending_count(self):
+        """Number of queued or running jobs."""
+        return ProcessingJob.objects(status__in=ACTIVE_STATUSES).count()
+
+    def enqueue(self, job_type, target_id):
+        """
+        Queue a job unless an active one already exists for the same target.
+
+        Raises:
+            QueueFullError: If the queue already holds ``max_pending`` jobs
+        """
+        target_id = str(target_id)
+        # A running job may be working on an older file, so only a queued job
+        # for the same target makes a new one redundant
+        existing = ProcessingJob.objects(job_type=job_type, target_id=target_id, status='queued').first()
+        if existing:
+            return existing
+
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError(f"Processing queue is full ({self.max_pending} pending jobs)")
+
+        # Atomic upsert; the partial unique index on queued jobs makes a concurrent
+        # enqueue for the same target fail instead of inserting a second job
+        now = datetime.datetime.utcnow()
+        try:
+            return ProcessingJob.objects(job_type=job_type, target_id=target_id, status='queued').modify(
+                upsert=True,
+                new=True,
+                set_on_insert__attempts=0,
+                set_on_insert__max_attempts=self.max_attempts,
+                set_on_insert__run_after=now,
+                set_on_insert__created_at=now,
+                set_on_insert__updated_at=now
+            )
+        except (NotUniqueError, DuplicateKeyError):
+            return ProcessingJob.objects(job_type=job_type, target_id=target_id, status='queued').first()
+
+    def claim(self, worker_id):
+        """Atomically claim the oldest runnable job, or return None."""
+        now = datetime.datetime.utcnow()
+        claimable = (
+            (Q(status='queued') & Q(run_after__lte=now)) |
+            (Q(status='running') & Q(lease_expires_at__lt=now))
+        )
+        return ProcessingJob.objects(claimable).order_by('created_at').modify(
+            new=True,
+            set__status='running',
+            set__worker_id=worker_id,
+            set__lease_expires_at=now + datetime.timedelta(seconds=self.lease_seconds),
+            set__updated_at=now,
+            inc__attempts=1
+        )
+
+    def heartbeat(self, job):
+        """Extend the lease of a running job; returns False if the lease was lost."""
+        now = datetime.datetime.utcnow()
+        updated = ProcessingJob.objects(id=job.id, status='running', worker_id=job.worker_id).update(
+            set__lease_expires_at=now + datetime.timedelta(seconds=self.lease_seconds),
+            set__updated_at=now
+        )
+        return bool(updated)
+
+    def complete(self, job):
+        now = datetime.datetime.utcnow()
+        ProcessingJob.objects(id=job.id, worker_id=job.worker_id).update(
+            set__status='completed',
+            set__completed_at=now,
+            set__updated_at=now,
+            unset__lease_expires_at=True
+        )
+
+    def fail(self, job, error):
+        """Record a failure and schedule a retry, or give up after max_attempts."""
+        now = datetime.datetime.utcnow()
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.id} ({job.job_type} {job.target_id}) failed permanently: {error}")
+            ProcessingJob.objects(id=job.id, worker_id=job.worker_id).update(
+                set__status='failed',
+                set__last_error=str(error),
+                set__updated_at=now,
+                unset__lease_expires_at=True
+            )
+            return False
+
+        backoff = datetime.timedelta(seconds=min(600, 10 * 2 ** (job.attempts - 1)))
+        logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying in {backoff}: {error}")
+        try:
+            ProcessingJob.objects(id=job.id, worker_id=job.worker_id).update(
+                set__status='queued',
+                set__last_error=str(error),
+                set__run_after=now + backoff,
+                set__updated_at=now,
+                unset__lease_expires_at=True
+            )
+        except (NotUniqueError, DuplicateKeyError):
+            # A newer job for the same target is already queued and will do the work
+            ProcessingJob.objects(id=job.id, worker_id=job.worker_id).update(
+                set__status='failed',
+                set__last_error=f"{error} (superseded by a queued job for the same target)",
+                set__updated_at=now,
+                unset__lease_expires_at=True
+            )
+        return True
+
+    def active_targets(self, job_type, target_ids):
+        """Subset of ``target_ids`` that already have a queued or running job."""
+        return set(ProcessingJob.objects(
+            job_type=job_type, target_id__in=[str(t) for t in target_ids], status__in=ACTIVE_STATUSES
+        ).distinct('target_id'))
+
+
+# Create a global instance
+job_queue = JobQueue()
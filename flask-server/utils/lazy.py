@@ -0,0 +1,45 @@
+import importlib
+import threading
+
+
+class LazyObject:
+    """
+    Stand-in for a module-level object that is imported on first use.
+
+    ``LazyObject('utils.document_processor', 'document_processor')`` behaves
+    like the global ``document_processor`` but only imports its module (and
+    whatever ML libraries that module pulls in) the first time an attribute is
+    accessed, so web workers that never touch it do not pay for loading it.
+    """
+
+    def __init__(self, module_name: str, attribute: str):
+        object.__setattr__(self, '_module_name', module_name)
+        object.__setattr__(self, '_attribute', attribute)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                target = self._target
+                if target is None:
+                    module = importlib.import_module(self._module_name)
+                    target = getattr(module, self._attribute)
+                    object.__setattr__(self, '_target', target)
+        return target
+
+    @property
+    def loaded(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self):
+        if self._target is None:
+            return f"<LazyObject {self._module_name}.{self._attribute} (not loaded)>"
+        return repr(self._target)
@@ -0,0 +1,25 @@
+import os
+import logging
+from mongoengine import connect
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def connect_mongo(is_production):
+    """Connect mongoengine using MONGODB_URI, falling back to localhost in development."""
+    try:
+        mongodb_uri = os.getenv('MONGODB_URI')
+        if not mongodb_uri:
+            # Fallback to localhost MongoDB in development
+            if not is_production:
+                mongodb_uri = 'mongodb://localhost:27017/assignment_checker'
+                logger.warning(f"MONGODB_URI not set, using default: {mongodb_uri}")
+            else:
+                raise ValueError("MONGODB_URI environment variable is not set")
+
+        connect(host=mongodb_uri)
+        logger.info(f"Successfully connected to MongoDB at: {mongodb_uri.split('@')[-1] if '@' in mongodb_uri else mongodb_uri}")
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+        raise
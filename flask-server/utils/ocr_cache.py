@@ -0,0 +1,95 @@
+import time
+import datetime
+import hashlib
+import logging
+import threading
+from mongoengine.errors import NotUniqueError
+from models.ocr_cache import OCRCacheEntry
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class OCRCache:
+    """
+    Content-addressed OCR result cache stored in MongoDB.
+
+    Entries are keyed by the SHA-256 of the PDF bytes plus the OCR engine
+    version, so a change of Tesseract version or extraction settings never
+    serves stale text. The collection is kept under ``max_bytes`` by evicting
+    the least recently used entries. The size check aggregates the whole
+    collection, so it runs at most once per ``evict_interval`` seconds per
+    process rather than on every ``put``.
+    """
+
+    def __init__(self, max_bytes=None, evict_interval=None):
+        self.max_bytes = max_bytes or Config.OCR_CACHE_MAX_BYTES
+        self.evict_interval = Config.OCR_CACHE_EVICT_INTERVAL if evict_interval is None else evict_interval
+        self._last_evict = 0.0
+        self._evict_lock = threading.Lock()
+
+    @staticmethod
+    def _key(sha256, engine_version):
+        return f"{sha256}:{engine_version}"
+
+    def get(self, sha256, engine_version):
+        """Return (text, details) for a cached PDF, or None on a miss."""
+        entry = OCRCacheEntry.objects(key=self._key(sha256, engine_version)).modify(
+            new=True,
+            inc__hits=1,
+            set__last_used_at=datetime.datetime.utcnow()
+        )
+        if entry is None:
+            return None
+        return entry.text, dict(entry.details or {})
+
+    def put(self, sha256, engine_version, text, details):
+        """Store an extraction result and evict old entries if over budget."""
+        try:
+            OCRCacheEntry(
+                key=self._key(sha256, engine_version),
+                sha256=sha256,
+                engine_version=engine_version,
+                text=text,
+                details=details,
+                size_bytes=len(text.encode('utf-8')) + len(str(details))
+            ).save()
+        except NotUniqueError:
+            # Another worker cached the same file first
+            return
+        self._maybe_evict()
+
+    def _maybe_evict(self):
+        with self._evict_lock:
+            now = time.monotonic()
+            if now - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = now
+        self._evict()
+
+    def _evict(self):
+        totals = list(OCRCacheEntry.objects.aggregate(
+            {'$group': {'_id': None, 'total': {'$sum': '$size_bytes'}}}
+        ))
+        total = totals[0]['total'] if totals else 0
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for entry in OCRCacheEntry.objects.order_by('last_used_at').only('id', 'size_bytes'):
+            if total <= self.max_bytes:
+                break
+            entry.delete()
+            total -= entry.size_bytes or 0
+            evicted += 1
+        logger.info(f"Evicted {evicted} OCR cache entries")
+
+
+# Create a global instance
+ocr_cache = OCRCache()
@@ -0,0 +1,92 @@
+import logging
+from bson import ObjectId
+from mongoengine.errors import NotUniqueError
+from mongoengine.queryset.visitor import Q
+from models.submission import Submission
+from models.passage_match import PassageMatch
+from ml_models.winnowing import unpack, match_spans
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PassageMatcher:
+    """
+    Matched passages between two submissions, aligned once from their stored
+    winnowing fingerprints and cached in ``passage_matches``.
+
+    Cache keys include both submissions' text hashes, so a re-processed text
+    never serves stale spans.
+    """
+
+    def matches(self, submission_id, other_id):
+        """
+        Matched passages of a submission pair, oriented from ``submission_id``.
+
+        Returns:
+            dict: 'spans' ('start'/'end' in the submission, 'other_start'/'other_end'
+            in the other one) and matched character counts, or None if either
+            submission has no fingerprints yet
+        """
+        rows = {
+            str(row['_id']): row for row in Submission.objects(id__in=[submission_id, other_id]).only(
+                'id', 'winnow_fingerprints', 'stage_keys').as_pymongo()
+        }
+        first, second = rows.get(str(submission_id)), rows.get(str(other_id))
+        if not first or not second or not first.get('winnow_fingerprints') or not second.get('winnow_fingerprints'):
+            return None
+
+        # Stored once per unordered pair, with a = the smaller id
+        swapped = str(first['_id']) > str(second['_id'])
+        a, b = (second, first) if swapped else (first, second)
+        key = ':'.join([str(a['_id']), str(b['_id']),
+                        (a.get('stage_keys') or {}).get('winnow', ''),
+                        (b.get('stage_keys') or {}).get('winnow', '')])
+
+        cached = PassageMatch.objects(key=key).first()
+        if cached is None:
+            cached = self._align(key, a, b)
+
+        spans = cached.spans
+        if swapped:
+            spans = sorted(({
+                'start': span['other_start'],
+                'end': span['other_end'],
+                'other_start': span['start'],
+                'other_end': span['end'],
+                'fingerprints': span['fingerprints']
+            } for span in spans), key=lambda span: span['start'])
+        return {
+            'spans': spans,
+            'matched_chars': cached.matched_chars_b if swapped else cached.matched_chars_a,
+            'other_matched_chars': cached.matched_chars_a if swapped else cached.matched_chars_b
+        }
+
+    @staticmethod
+    def _align(key, a, b):
+        spans = match_spans(unpack(bytes(a['winnow_fingerprints'])), unpack(bytes(b['winnow_fingerprints'])))
+        entry = PassageMatch(
+            key=key,
+            submission_a=a['_id'],
+            submission_b=b['_id'],
+            spans=spans,
+            matched_chars_a=sum(span['end'] - span['start'] for span in spans),
+            matched_chars_b=sum(span['other_end'] - span['other_start'] for span in spans)
+        )
+        try:
+            entry.save()
+        except NotUniqueError:
+            # Another request aligned the same pair first
+            pass
+        return entry
+
+    @staticmethod
+    def remove_submission(submission_id):
+        """Drop cached passages of a deleted or resubmitted submission."""
+        submission_id = ObjectId(str(submission_id))
+        PassageMatch.objects(Q(submission_a=submission_id) | Q(submission_b=submission_id)).delete()
+
+
+# Create a global instance
+passage_matcher = PassageMatcher()
@@ -0,0 +1,95 @@
+import logging
+from typing import Dict, Iterable
+from bson import ObjectId
+from pymongo import UpdateOne
+from config import Config
+from models.submission import Submission
+from utils.scoring import compute_final_scores
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def plagiarism_result(details) -> str:
+    """
+    Derive a submission's plagiarism result from the evidence in its plagiarism details.
+
+    The result is 'found' if any of these matched: the submission's own
+    pre-screen (``prescreen_found``), another submission's pre-screen
+    (``matched_by``), the cross-assignment check (``cross_assignment.found``)
+    or the assignment-wide analysis (``analysis_found``).
+    """
+    details = details or {}
+    prescreen_found = Config.PLAGIARISM_PRESCREEN and (
+        details.get('prescreen_found', False) or bool(details.get('matched_by'))
+    )
+    reuse_found = (details.get('cross_assignment') or {}).get('found', False)
+    analysis_found = details.get('analysis_found', False)
+    return 'found' if prescreen_found or reuse_found or analysis_found else 'not found'
+
+
+class PlagiarismFlags:
+    """
+    Matches a submission's pre-screen found on other submissions of its assignment.
+
+    Each match is stored on the other submission as
+    ``plagiarism_details.matched_by.<checked submission id>``; the checked
+    submission owns these entries and replaces them on every check. The other
+    submissions' plagiarism result and final score are then derived again from
+    their stored evidence, so a match that disappears also clears its flag.
+    """
+
+    def set_matches(self, assignment_id, submission_id, matches: Dict[str, Dict]):
+        """
+        Replace the matches a submission found on other submissions.
+
+        Args:
+            assignment_id: Assignment of the submissions
+            submission_id: The checked submission
+            matches (Dict[str, Dict]): Other submission id -> {'types': [...], 'similarity_score': float}
+        """
+        field = f"plagiarism_details.matched_by.{submission_id}"
+        collection = Submission._get_collection()
+        previous = [row['_id'] for row in collection.find(
+            {'assignment': ObjectId(str(assignment_id)), field: {'$exists': True}}, {'_id': 1}
+        )]
+        operations = [
+            UpdateOne({'_id': pk}, {'$unset': {field: ''}})
+            for pk in previous if str(pk) not in matches
+        ] + [
+            UpdateOne({'_id': ObjectId(sid)}, {'$set': {field: match}})
+            for sid, match in matches.items()
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            self.refresh(set(previous) | {ObjectId(sid) for sid in matches})
+
+    def remove_submission(self, assignment_id, submission_id):
+        """Drop the matches of a deleted or resubmitted submission."""
+        self.set_matches(assignment_id, submission_id, {})
+
+    @staticmethod
+    def refresh(submission_ids: Iterable):
+        """Derive the plagiarism result and final score of submissions from their stored evidence."""
+        collection = Submission._get_collection()
+        rows = list(collection.find(
+            {'_id': {'$in': [ObjectId(str(pk)) for pk in submission_ids]}},
+            {'correctness_score': 1, 'plagiarism_severity': 1, 'plagiarism_details': 1}
+        ))
+        if not rows:
+            return
+        results = [plagiarism_result(row.get('plagiarism_details')) for row in rows]
+        final_scores = compute_final_scores(
+            [row.get('correctness_score') for row in rows],
+            results,
+            [row.get('plagiarism_severity') for row in rows]
+        )
+        collection.bulk_write([
+            UpdateOne({'_id': row['_id']}, {'$set': {'plagiarism_result': result, 'final_score': final_score}})
+            for row, result, final_score in zip(rows, results, final_scores)
+        ], ordered=False)
+
+
+# Create a global instance
+plagiarism_flags = PlagiarismFlags()
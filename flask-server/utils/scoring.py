@@ -0,0 +1,45 @@
+import numpy as np
+
+# Share of the correctness score removed when plagiarism is found, per severity
+PENALTY_MAP = {'easy': 0.10, 'medium': 0.25, 'hard': 0.50}
+DEFAULT_SEVERITY = 'medium'
+
+
+def compute_final_scores(correctness_scores, plagiarism_results, severities, penalty_map=None):
+    """
+    Apply the plagiarism penalty to many correctness scores in one vectorized pass.
+
+    Args:
+        correctness_scores (list): Correctness scores out of 100 (None when missing)
+        plagiarism_results (list): 'found' or 'not found' per submission
+        severities (list): 'easy', 'medium' or 'hard' per submission (None = medium)
+        penalty_map (dict): Penalty per severity, defaults to PENALTY_MAP
+
+    Returns:
+        list: Final scores, None where there is no correctness score
+    """
+    penalty_map = penalty_map or PENALTY_MAP
+    default_penalty = penalty_map.get(DEFAULT_SEVERITY, PENALTY_MAP[DEFAULT_SEVERITY])
+
+    scores = np.array([np.nan if c is None else c for c in correctness_scores], dtype=np.float64)
+    found = np.array([r == 'found' for r in plagiarism_results], dtype=bool)
+    penalties = np.array([penalty_map.get(s or DEFAULT_SEVERITY, default_penalty) for s in severities],
+                         dtype=np.float64)
+
+    final = np.where(found, np.round(scores * (1 - penalties), 2), scores)
+    return [None if np.isnan(value) else float(value) for value in final]
+
+
+def compute_final_score(correctness_score, plagiarism_result, severity):
+    """
+    Apply the plagiarism penalty to a correctness score.
+
+    Args:
+        correctness_score (float): Correctness score out of 100, or None
+        plagiarism_result (str): 'found' or 'not found'
+        severity (str): 'easy', 'medium' or 'hard' (defaults to medium)
+
+    Returns:
+        float: Final score, or None when there is no correctness score
+    """
+    return compute_final_scores([correctness_score], [plagiarism_result], [severity])[0]
@@ -0,0 +1,254 @@
+"""
+Submission processing worker.
+
+Claims jobs from the ``processing_jobs`` collection and runs them outside the
+web server, so OCR and embedding work never competes with request handling:
+
+    AUTOASSIGN_ROLE=worker python -m worker [--workers N]
+
+With ``AUTOASSIGN_ROLE=all`` the same job threads run inside the web process
+instead (see ``start_embedded``).
+"""
+import os
+import socket
+import signal
+import logging
+import argparse
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from config import Config
+from models.submission import Submission
+from models.assignment import Assignment
+from utils.mongo import connect_mongo
+from utils.job_queue import job_queue, QueueFullError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How often to look for submissions left Pending/Processing without a job
+RECOVERY_INTERVAL = 60
+
+
+def _process_submission(target_id):
+    from utils.document_processor import document_processor
+    document_processor._process_submission(target_id, raise_errors=True)
+
+
+def _submission_failed(target_id, error):
+    Submission.objects(id=target_id).update(
+        set__processing_status='Failed',
+        set__processing_error=str(error)
+    )
+
+
+def _analyze_assignment(target_id):
+    from utils.assignment_analysis import assignment_analyzer
+    assignment_analyzer.run(target_id)
+
+
+def _analysis_failed(target_id, error):
+    from utils.assignment_analysis import assignment_analyzer
+    assignment_analyzer.fail(target_id, error)
+
+
+def _extract_model_answer(target_id):
+    from utils.document_processor import document_processor
+    document_processor.process_model_answer(target_id, raise_errors=True)
+
+
+def _model_answer_failed(target_id, error):
+    Assignment.objects(id=target_id).update(
+        set__model_answer_status='Failed',
+        set__model_answer_error=str(error)
+    )
+
+
+# job_type -> (handler, called when the job is given up)
+JOB_HANDLERS = {
+    'process_submission': (_process_submission, _submission_failed),
+    'assignment_analysis': (_analyze_assignment, _analysis_failed),
+    'extract_model_answer': (_extract_model_answer, _model_answer_failed),
+}
+
+
+class Worker:
+    def __init__(self, concurrency=None, poll_interval=None):
+        """
+        Pool of threads that claim and run queued jobs.
+
+        Args:
+            concurrency (int): Number of jobs run at the same time
+            poll_interval (float): Seconds to wait when the queue is empty
+        """
+        self.concurrency = concurrency or Config.JOB_WORKERS
+        self.poll_interval = poll_interval or Config.JOB_POLL_INTERVAL
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        """Start the job threads and the stuck-submission and model answer recovery thread."""
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._loop, args=(f"{self.worker_id}:{index}",),
+                name=f"job-worker-{index}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        recovery = threading.Thread(target=self._recovery_loop, name='job-recovery', daemon=True)
+        recovery.start()
+        self.threads.append(recovery)
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} job threads")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _loop(self, worker_id):
+        while not self.stop_event.is_set():
+            try:
+                job = job_queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                self.stop_event.wait(self.poll_interval)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        handler, on_give_up = JOB_HANDLERS[job.job_type]
+        if job.attempts > job.max_attempts:
+            # Every previous attempt lost its lease (worker killed mid-job)
+            error = 'Job abandoned after repeated worker failures'
+            job_queue.fail(job, error)
+            on_give_up(job.target_id, error)
+            return
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            logger.info(f"Running job {job.id} ({job.job_type} {job.target_id}), attempt {job.attempts}")
+            handler(job.target_id)
+            job_queue.complete(job)
+        except Exception as e:
+            if not job_queue.fail(job, e):
+                on_give_up(job.target_id, e)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _heartbeat(self, job, done):
+        while not done.wait(job_queue.lease_seconds / 3):
+            if not job_queue.heartbeat(job):
+                logger.warning(f"Lost lease on job {job.id}")
+                return
+
+    def _recovery_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.recover_stuck_submissions()
+                self.recover_stuck_model_answers()
+            except Exception as e:
+                logger.error(f"Error recovering stuck submissions: {str(e)}")
+            self.stop_event.wait(RECOVERY_INTERVAL)
+
+    def recover_stuck_submissions(self):
+        """Queue submissions left Pending/Processing without an active job."""
+        stuck = [str(pk) for pk in Submission.objects(
+            processing_status__in=['Pending', 'Processing']).scalar('id')]
+        if not stuck:
+            return 0
+        active = job_queue.active_targets('process_submission', stuck)
+        recovered = 0
+        for submission_id in stuck:
+            if submission_id in active:
+                continue
+            try:
+                job_queue.enqueue('process_submission', submission_id)
+                recovered += 1
+            except QueueFullError:
+                break
+        if recovered:
+            logger.info(f"Re-queued {recovered} stuck submissions")
+        return recovered
+
+    def recover_stuck_model_answers(self):
+        """Queue model answers left Pending/Processing without an active job."""
+        stuck = [str(pk) for pk in Assignment.objects(
+            model_answer_status__in=['Pending', 'Processing']).scalar('id')]
+        if not stuck:
+            return 0
+        active = job_queue.active_targets('extract_model_answer', stuck)
+        recovered = 0
+        for assignment_id in stuck:
+            if assignment_id in active:
+                continue
+            try:
+                job_queue.enqueue('extract_model_answer', assignment_id)
+                recovered += 1
+            except QueueFullError:
+                break
+        if recovered:
+            logger.info(f"Re-queued {recovered} stuck model answers")
+        return recovered
+
+
+_embedded = None
+
+
+def start_embedded(concurrency=None):
+    """
+    Run job threads inside the current process, for the 'all' role (and a
+    gunicorn-served 'worker' role). Called after fork, never in the gunicorn master.
+    """
+    global _embedded
+    if _embedded is None:
+        if Config.MODEL_WARMUP:
+            from ml_models.model_registry import model_registry
+            model_registry.warmup()
+        _embedded = Worker(concurrency=concurrency)
+        _embedded.start()
+    return _embedded
+
+
+def stop_embedded():
+    if _embedded is not None:
+        _embedded.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the submission processing worker')
+    parser.add_argument('--workers', type=int, default=Config.JOB_WORKERS,
+                        help='Number of jobs processed concurrently')
+    args = parser.parse_args()
+
+    connect_mongo(os.getenv('FLASK_ENV') == 'production')
+
+    if Config.ROLE == 'web':
+        logger.warning("AUTOASSIGN_ROLE is 'web'; running jobs anyway because the worker was started explicitly")
+    if Config.MODEL_WARMUP:
+        # One shared model for every job thread in this process
+        from ml_models.model_registry import model_registry
+        model_registry.warmup()
+        logger.info(f"Model stats: {model_registry.stats()}")
+
+    worker = Worker(concurrency=args.workers)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.start()
+    worker.join()
+    logger.info("Worker stopped")
+
+
+if __name__ == '__main__':
+    main()